@@ -16,6 +16,7 @@ class BedrockModelAdapter(ModelInterface):
         self.model_id = model_id
         self.region_name = region_name
         self.client = None
+        self.is_loaded = False
         
         # Simple model detection - just check if it's Llama or use default
         self.is_llama = "llama" in model_id.lower()
@@ -37,6 +38,7 @@ class BedrockModelAdapter(ModelInterface):
             
             # Test with simple request
             await self._test_connection()
+            self.is_loaded = True
             
             model_name = "Llama" if self.is_llama else "Bedrock Model"
             logger.info(f"✅ {model_name} ready for medical inference")
@@ -1,35 +1,70 @@
 """Embedding model adapter for medical text processing"""
 
 import asyncio
+import hashlib
+import itertools
 import time
 import logging
+import weakref
+from collections import OrderedDict
+from operator import itemgetter
 from typing import List, Dict, Any, Optional, Union
 import numpy as np
 import os
 
 logger = logging.getLogger(__name__)
 
+# Max number of text embeddings kept in the per-adapter LRU cache
+EMBEDDING_CACHE_SIZE = 4096
+
+# Loaded SentenceTransformer models by name; entries vanish once no adapter holds the model
+_MODEL_REGISTRY: "weakref.WeakValueDictionary[str, Any]" = weakref.WeakValueDictionary()
+
 class EmbedderAdapter:
     """Embedding model adapter for medical text similarity and search"""
     
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", cache_size: int = EMBEDDING_CACHE_SIZE):
         self.model_name = model_name
         self.embedder = None
         self.is_loaded = False
         self.load_time = None
         self.embedding_dim = None
         
+        # LRU cache of content hash -> embedding, so repeated symptom strings/question templates skip the forward pass
+        self.cache_size = cache_size
+        self._embedding_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        
     async def load_model(self):
         """Load the embedding model"""
+        self.load_model_sync()
+    
+    def load_model_sync(self):
+        """Load the embedding model (blocking; ModelManager runs this on its loader thread pool)"""
         try:
             logger.info(f"🔍 Loading embedding model: {self.model_name}")
             start_time = time.time()
             
             try:
                 from sentence_transformers import SentenceTransformer
+                import torch
                 
-                # Try to load the model
-                self.embedder = SentenceTransformer(self.model_name)
+                # Reuse the model if another adapter instance still holds it in memory
+                self.embedder = _MODEL_REGISTRY.get(self.model_name)
+                if self.embedder is not None:
+                    logger.info(f"♻️ Reusing in-memory embedding model: {self.model_name}")
+                else:
+                    # Try to load the model (on the CPU first, then moved to the GPU if there is one)
+                    self.embedder = SentenceTransformer(self.model_name, device="cpu")
+                    if torch.cuda.is_available():
+                        # Pinned host memory + a private stream, so this H2D copy overlaps the skin model's
+                        stream = torch.cuda.Stream()
+                        with torch.cuda.stream(stream):
+                            for tensor in itertools.chain(self.embedder.parameters(), self.embedder.buffers()):
+                                tensor.data = tensor.data.pin_memory().to("cuda", non_blocking=True)
+                        stream.synchronize()
+                    _MODEL_REGISTRY[self.model_name] = self.embedder
                 
                 # Test the model to get embedding dimension
                 test_embedding = self.embedder.encode("test text")
@@ -57,34 +92,88 @@ class EmbedderAdapter:
             raise
     
     async def encode_text(self, text: Union[str, List[str]]) -> np.ndarray:
-        """Encode text into embeddings"""
+        """Encode text into embeddings (cached by content hash)"""
         if not self.is_loaded:
             raise Exception("Embedding model not loaded")
         
         try:
             start_time = time.time()
             
-            # Handle mock embedder
-            if self.embedder == "mock_embedder":
-                embeddings = self._generate_mock_embeddings(text)
-            else:
-                # Real embedding generation
-                embeddings = self.embedder.encode(text)
+            texts = [text] if isinstance(text, str) else list(text)
+            if not texts:
+                return np.empty((0, self.embedding_dim))
+            
+            # Partition into cache hits and misses
+            keys = [self._cache_key(t) for t in texts]
+            found: Dict[bytes, np.ndarray] = {}
+            missing: Dict[bytes, str] = {}
+            for key, t in zip(keys, texts):
+                if key in found or key in missing:
+                    continue
+                cached = self._embedding_cache.get(key)
+                if cached is not None:
+                    self._embedding_cache.move_to_end(key)
+                    found[key] = cached
+                else:
+                    missing[key] = t
+            
+            self._cache_hits += len(found)
+            self._cache_misses += len(missing)
+            
+            # Encode all misses in one batched call
+            if missing:
+                new_embeddings = self._encode_uncached(list(missing.values()))
+                for key, embedding in zip(missing, new_embeddings):
+                    embedding.setflags(write=False)  # shared between callers via the cache
+                    found[key] = embedding
+                    self._cache_store(key, embedding)
             
             inference_time = time.time() - start_time
+            logger.debug(f"🔍 Encoded text in {inference_time:.3f}s ({len(missing)} computed, {len(texts) - len(missing)} cached)")
             
-            # Ensure numpy array format
-            if not isinstance(embeddings, np.ndarray):
-                embeddings = np.array(embeddings)
-            
-            logger.debug(f"🔍 Encoded text in {inference_time:.3f}s")
+            # Return single array if input was single string
+            if isinstance(text, str):
+                return found[keys[0]]
             
-            return embeddings
+            return np.stack([found[key] for key in keys])
             
         except Exception as e:
             logger.error(f"❌ Text encoding failed: {e}")
             raise
     
+    def _encode_uncached(self, texts: List[str]) -> np.ndarray:
+        """Run the embedding model on a batch of texts"""
+        # Handle mock embedder
+        if self.embedder == "mock_embedder":
+            embeddings = self._generate_mock_embeddings(texts)
+        else:
+            # Real embedding generation
+            embeddings = self.embedder.encode(texts)
+        
+        # Ensure numpy array format
+        if not isinstance(embeddings, np.ndarray):
+            embeddings = np.array(embeddings)
+        
+        return embeddings
+    
+    @staticmethod
+    def _cache_key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    
+    def _cache_store(self, key: bytes, embedding: np.ndarray):
+        self._embedding_cache[key] = embedding
+        if len(self._embedding_cache) > self.cache_size:
+            self._embedding_cache.popitem(last=False)
+    
+    def cache_info(self) -> Dict[str, int]:
+        """Embedding cache statistics"""
+        return {
+            "hits": self._cache_hits,
+            "misses": self._cache_misses,
+            "maxsize": self.cache_size,
+            "currsize": len(self._embedding_cache)
+        }
+    
     async def compute_similarity(self, text1: str, text2: str) -> float:
         """Compute cosine similarity between two texts"""
         try:
@@ -124,7 +213,7 @@ class EmbedderAdapter:
                 })
             
             # Sort by similarity and return top_k
-            similarities.sort(key=lambda x: x["similarity"], reverse=True)
+            similarities.sort(key=itemgetter("similarity"), reverse=True)
             
             return similarities[:top_k]
             
@@ -265,7 +354,8 @@ class EmbedderAdapter:
             "model_name": self.model_name,
             "load_time": self.load_time,
             "embedding_dimension": self.embedding_dim,
-            "is_mock": self.embedder == "mock_embedder"
+            "is_mock": self.embedder == "mock_embedder",
+            "cache": self.cache_info()
         }
     
     async def cleanup(self):
@@ -275,6 +365,92 @@ class EmbedderAdapter:
                 del self.embedder
             self.embedder = None
             self.is_loaded = False
+            self._embedding_cache.clear()
             logger.info("✅ Embedding adapter cleaned up")
         except Exception as e:
-            logger.error(f"❌ Embedding cleanup failed: {e}")
\ No newline at end of file
+            logger.error(f"❌ Embedding cleanup failed: {e}")
+
+class BatchingEmbedder:
+    """Micro-batches concurrent single-text encode_text calls into one model call.
+    
+    Requests arriving within max_latency of each other (up to max_batch_size) share a forward pass.
+    Every other attribute is forwarded to the wrapped EmbedderAdapter.
+    """
+    
+    def __init__(self, adapter: EmbedderAdapter, max_batch_size: int = 32, max_latency: float = 0.01):
+        self.adapter = adapter
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_task: Optional[asyncio.Task] = None
+    
+    def __getattr__(self, name):
+        return getattr(self.adapter, name)
+    
+    async def encode_text(self, text: Union[str, List[str]]) -> np.ndarray:
+        """Encode text; single strings are queued and batched with concurrent callers"""
+        if not isinstance(text, str):
+            return await self.adapter.encode_text(text)
+        
+        if self._batch_task is None or self._batch_task.done():
+            self._queue = asyncio.Queue()
+            self._batch_task = asyncio.create_task(self._batch_loop())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+    
+    async def _batch_loop(self):
+        """Collect queued texts into batches and resolve each caller's future"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                deadline = loop.time() + self.max_latency
+                
+                while len(batch) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                
+                embeddings = await self.adapter.encode_text([text for text, _ in batch])
+            except asyncio.CancelledError:
+                # Stopped by cleanup() mid-batch: cancel the in-flight callers instead of leaving them waiting
+                for _, future in batch:
+                    if not future.done():
+                        future.cancel()
+                raise
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            logger.debug(f"🔍 Embedded batch of {len(batch)} texts")
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+    
+    async def cleanup(self):
+        """Stop the batching task, fail pending requests and cleanup the wrapped adapter"""
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            try:
+                # Let the loop resolve its in-flight batch before the queue and adapter go away
+                await self._batch_task
+            except asyncio.CancelledError:
+                pass
+            self._batch_task = None
+        
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.cancel()
+            self._queue = None
+        
+        await self.adapter.cleanup()
@@ -1,5 +1,6 @@
 import asyncio
 import functools
+import itertools
 import timm
 import torch
 from torchvision import transforms
@@ -20,6 +21,7 @@ class EfficientNetAdapter:
         self.device = None
         self.transform = None
         self.load_time = None
+        self.is_loaded = False
         
         # Define skin lesion classes
         self.classes = [
@@ -44,18 +46,30 @@ class EfficientNetAdapter:
     
     async def load_model(self):
         """Load the model asynchronously"""
+        self.load_model_sync()
+    
+    def load_model_sync(self):
+        """Load the model (blocking; ModelManager runs this on its loader thread pool)"""
         try:
             logger.info(f"🖼️ Loading skin lesion model from {self.model_path}")
             start_time = time.time()
             
             self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
             
-            # Load real model
+            # Load real model (weights staged on the CPU, then copied to the device)
             self.model = timm.create_model('efficientnet_b0', num_classes=len(self.classes))
-            checkpoint = torch.load(self.model_path, map_location=self.device)
+            checkpoint = torch.load(self.model_path, map_location="cpu")
             self.model.load_state_dict(checkpoint["model_state_dict"])
-        
-            self.model.to(self.device)
+            
+            if self.device.type == "cuda":
+                # Pinned host memory + a private stream, so this H2D copy overlaps the embedder's
+                stream = torch.cuda.Stream()
+                with torch.cuda.stream(stream):
+                    for tensor in itertools.chain(self.model.parameters(), self.model.buffers()):
+                        tensor.data = tensor.data.pin_memory().to(self.device, non_blocking=True)
+                stream.synchronize()
+            else:
+                self.model.to(self.device)
             self.model.eval()
             
             # Set up transforms
@@ -70,6 +84,7 @@ class EfficientNetAdapter:
             ])
             
             self.load_time = time.time() - start_time
+            self.is_loaded = True
             
             logger.info(f"✅ Skin lesion model loaded in {self.load_time:.2f}s")
             
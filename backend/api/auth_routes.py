@@ -66,12 +66,12 @@ class ChangePasswordRequest(BaseModel):
     
 medical_report_node = None
 
-def get_medical_report_node():
+async def get_medical_report_node():
     """Get or create medical report node with loaded adapter"""
     global medical_report_node
     if medical_report_node is None:
         from managers.model_manager import model_manager
-        adapter = model_manager.get_local_adapter()
+        adapter = await model_manager.get_local_adapter()
         if adapter is None:
             raise HTTPException(status_code=503, detail="Models not loaded yet")
         medical_report_node = MedicalReportNode(adapter, supabase)
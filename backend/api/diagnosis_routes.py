@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Form, UploadFile, File, HTTPException
 from fastapi.responses import Response
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 import uuid
 import base64
 from datetime import datetime
@@ -8,6 +8,7 @@ import logging
 import json
 
 import os
+from pydantic import TypeAdapter, ValidationError
 from nodes import LLMDiagnosisNode, ImageClassificationNode, FollowUpInteractionNode, OverallAnalysisNode, MedicalReportNode 
 from schemas.medical_schemas import AgentState
 from managers.websocket_manager import ConnectionManager
@@ -22,6 +23,16 @@ manager = ConnectionManager()
 # Configure logger
 logger = logging.getLogger(__name__)
 
+# Parses previous_state JSON straight into AgentState (single pass in pydantic-core)
+_STATE_ADAPTER = TypeAdapter(AgentState)
+
+def parse_previous_state(previous_state: str) -> AgentState:
+    """Validate the previous_state form field, reporting malformed state as a client error (422)"""
+    try:
+        return _STATE_ADAPTER.validate_json(previous_state)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
 #Global node instances
 llm_diagnosis_node: LLMDiagnosisNode | None = None
 followup_interaction_node: FollowUpInteractionNode | None = None
@@ -51,7 +62,7 @@ def update_session_state(session_id: str, updated_state: AgentState) -> None:
     """Update session state in storage"""
     session_states[session_id] = updated_state
     
-def initialize_nodes_once():
+async def initialize_nodes_once():
     """Initialize all nodes ONCE with pre-loaded models"""
     global llm_diagnosis_node, followup_interaction_node, image_classification_node
     global overall_analysis_node, medical_report_node
@@ -61,8 +72,10 @@ def initialize_nodes_once():
     
     print("🔧 Initializing nodes with loaded models...")
 
-    # Get BedRock adapter (always available)
-    bedrock_adapter = model_manager.get_bedrock_adapter()
+    # Get BedRock adapter (loads the LLM here if it wasn't preloaded at startup)
+    bedrock_adapter = await model_manager.get_bedrock_adapter()
+    if bedrock_adapter is None:
+        raise RuntimeError("Bedrock LLM adapter is not available")
 
     llm_diagnosis_node = LLMDiagnosisNode(adapter=bedrock_adapter)
     followup_interaction_node = FollowUpInteractionNode(adapter=bedrock_adapter)
@@ -73,7 +86,7 @@ def initialize_nodes_once():
     image_classification_node = None
     print("✅ All nodes initialized with loaded models!")
     
-def ensure_nodes_initialized():
+async def ensure_nodes_initialized():
     """check if models are loaded"""
     if not model_manager.is_loaded():
         raise HTTPException(status_code=503, detail="Models not loaded yet. Please wait for startup to complete.")
@@ -81,7 +94,7 @@ def ensure_nodes_initialized():
     #Initialize nodes if they're not already initialized
     if llm_diagnosis_node is None:
         try:
-            initialize_nodes_once()
+            await initialize_nodes_once()
         except Exception as e:
             logger.error(f"Failed to initialize nodes: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to initialize nodes: {e}")
@@ -116,7 +129,7 @@ async def run_textual_analysis(
     """Run LLM textual analysis on symptoms"""
     
     # Ensure nodes are initialized with loaded models
-    ensure_nodes_initialized()
+    await ensure_nodes_initialized()
     
    # 🔧 DEBUG: Add post-check
     print(f"🔍 Post-check - LLM node is None: {llm_diagnosis_node is None}")
@@ -139,12 +152,7 @@ async def run_textual_analysis(
         ))
                 
         # Send progress update
-        await manager.send_message(session_id, {
-            "type": "node_started",
-            "node": "textual_analysis",
-            "message": "Analyzing symptoms with AI...",
-            "timestamp": datetime.now().isoformat()
-        })
+        await manager.send_node_event(session_id, "node_started", "textual_analysis", "Analyzing symptoms with AI...")
         
         # Run the LLM diagnosis node
         result = await llm_diagnosis_node(state)
@@ -194,14 +202,12 @@ async def run_followup_questions(
     """Generate follow-up questions OR process responses"""
     
     # Ensure nodes are initialized with loaded models
-    ensure_nodes_initialized()
+    await ensure_nodes_initialized()
+    state = parse_previous_state(previous_state)
     
     try:
         ### Solution 1: Try deleting the followup_response here instead 
         
-        import json
-        state = json.loads(previous_state)
-        
         print("check followup_responses:", followup_responses)
         
         # Add follow-up responses if provided
@@ -211,12 +217,7 @@ async def run_followup_questions(
             state["followup_response"] = json.loads(followup_responses)
             state["requires_user_input"] = False
         
-        await manager.send_message(session_id, {
-            "type": "node_started",
-            "node": "followup_questions",
-            "message": "Processing follow-up interaction...",
-            "timestamp": datetime.now().isoformat()
-        })
+        await manager.send_node_event(session_id, "node_started", "followup_questions", "Processing follow-up interaction...")
         
         # Run the follow-up interaction node
         result = await followup_interaction_node(state)
@@ -262,33 +263,21 @@ async def run_image_analysis(
     """Run image classification analysis"""
     
     # Ensure nodes are initialized with loaded models
-    ensure_nodes_initialized()
+    await ensure_nodes_initialized()
+    state = parse_previous_state(previous_state)
     
     try:
-        import json
-        state = json.loads(previous_state)
-        
         # Handle new image upload
         if image_file:
             image_bytes = await image_file.read()
             state["image_input"] = base64.b64encode(image_bytes).decode('utf-8')
         
-        await manager.send_message(session_id, {
-            "type": "node_started",
-            "node": "image_analysis",
-            "message": "Analyzing medical image...",
-            "timestamp": datetime.now().isoformat()
-        })
+        await manager.send_node_event(session_id, "node_started", "image_analysis", "Analyzing medical image...")
         
         #Get image classification node with on-demand loading
         image_node = await get_image_classification_node()
         
-        await manager.send_message(session_id, {
-            "type": "node_progress",
-            "node": "image_analysis", 
-            "message": "Analyzing medical image...",
-            "timestamp": datetime.now().isoformat()
-        })
+        await manager.send_node_event(session_id, "node_progress", "image_analysis", "Analyzing medical image...")
         
         # Run the image classification node
         result = await image_node(state)
@@ -336,18 +325,11 @@ async def run_overall_analysis(
     """Run comprehensive overall analysis"""
     
     # Ensure nodes are initialized with loaded models
-    ensure_nodes_initialized()
+    await ensure_nodes_initialized()
+    state = parse_previous_state(previous_state)
     
     try:
-        import json
-        state = json.loads(previous_state)
-        
-        await manager.send_message(session_id, {
-            "type": "node_started",
-            "node": "overall_analysis",
-            "message": "Performing comprehensive analysis...",
-            "timestamp": datetime.now().isoformat()
-        })
+        await manager.send_node_event(session_id, "node_started", "overall_analysis", "Performing comprehensive analysis...")
         
         # Run the overall analysis node
         result = await overall_analysis_node(state)
@@ -451,17 +433,11 @@ async def export_medical_report(
     previous_state: str = Form(..., description="JSON of previous AgentState")
 ):
     """Generate and export medical report in PDF or Word format"""
-    ensure_nodes_initialized()
+    await ensure_nodes_initialized()
+    state = parse_previous_state(previous_state)
     
     try:
-        state = json.loads(previous_state)
-
-        await manager.send_message(session_id, {
-            "type": "node_started",
-            "node": "medical_report",
-            "message": "Generating comprehensive medical report...",
-            "timestamp": datetime.now().isoformat()
-        })
+        await manager.send_node_event(session_id, "node_started", "medical_report", "Generating comprehensive medical report...")
         
         result = await medical_report_node(state)
         
@@ -560,6 +536,14 @@ async def debug_routes():
         ]
     }
 
+@diagnosis_router.get("/debug/embedding_cache")
+async def debug_embedding_cache():
+    """Embedding cache hit/miss statistics"""
+    embedder_adapter = model_manager.embedder_adapter
+    if embedder_adapter is None:
+        raise HTTPException(status_code=503, detail="Embedding adapter not created yet")
+    return embedder_adapter.cache_info()
+
 # **Unused - Enhanced diagnostic endpoint with WebSocket integration
 @diagnosis_router.post("/patient/diagnose_patient_realtime")
 async def diagnose_patient_realtime(
@@ -572,7 +556,7 @@ async def diagnose_patient_realtime(
     """Enhanced diagnosis with real-time WebSocket updates"""
     
     # Ensure nodes are initialized with loaded models
-    ensure_nodes_initialized()
+    await ensure_nodes_initialized()
     
     if not session_id:
         session_id = f"session_{uuid.uuid4().hex[:8]}"
@@ -658,18 +642,20 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+# Graph node name -> (stage description, progress %) reported during workflow execution
+WORKFLOW_STAGES: Dict[str, Tuple[str, int]] = {
+    "llm_diagnosis": ("Analyzing symptoms with AI", 20),
+    "followup_interaction": ("Generating follow-up questions", 40),
+    "image_analysis": ("Processing medical images", 60),
+    "overall_analysis_step": ("Comprehensive medical analysis", 80),
+    "healthcare_recommendation_step": ("Finding healthcare recommendations", 90),
+    "generate_report": ("Generating medical report", 100),
+}
+
 # Workflow execution with real-time updates
 async def run_workflow_with_updates(state: AgentState, session_id: str):
     """Run the LangGraph workflow with real-time WebSocket updates"""
     
-    workflow_stages = [
-        ("llm_diagnosis", "Analyzing symptoms with AI", 20),
-        ("followup_interaction", "Generating follow-up questions", 40), 
-        ("image_analysis", "Processing medical images", 60),
-        ("overall_analysis_step", "Comprehensive medical analysis", 80), 
-        ("healthcare_recommendation_step", "Finding healthcare recommendations", 90),  
-        ("generate_report", "Generating medical report", 100)
-    ]
     current_progress = 0
     
     # Create a custom callback for workflow updates
@@ -677,9 +663,10 @@ async def run_workflow_with_updates(state: AgentState, session_id: str):
         nonlocal current_progress
         
         # Find current stage info
-        stage_info = next((s for s in workflow_stages if s[0] == node_name), None)
+        stage_info = WORKFLOW_STAGES.get(node_name)
         if stage_info:
-            stage_name, description, progress = stage_info
+            stage_name = node_name
+            description, progress = stage_info
             current_progress = progress
             
             # Update session workflow data
@@ -783,7 +770,7 @@ async def terminate_session(session_id: str):
             "message": "Session has been terminated",
             "timestamp": datetime.now().isoformat()
         })
-        manager.disconnect(session_id)
+        await manager.disconnect(session_id)
     
     return {
         "success": True,
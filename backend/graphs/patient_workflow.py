@@ -1,10 +1,11 @@
 from langgraph.graph import StateGraph, END
 from schemas.medical_schemas import AgentState
 import asyncio
+import functools
+import logging
 import os
-from adapters.local_model_adapter import LocalModelAdapter
-from adapters.skinlesion_efficientNet_adapter import EfficientNetAdapter
-from adapters.embedder_adapter import EmbedderAdapter
+import threading
+import numpy as np
 from nodes import LLMDiagnosisNode, ImageClassificationNode, FollowUpInteractionNode, OverallAnalysisNode, HealthcareRecommendationNode, MedicalReportNode 
 
 
@@ -18,26 +19,56 @@ from nodes import LLMDiagnosisNode, ImageClassificationNode, FollowUpInteraction
 #     SessionEndCheck
 # )
 
+logger = logging.getLogger(__name__)
+
 multipurpose_model_path = "ai_models/Llama-3.1-8B-UltraMedical.Q8_0.gguf" 
 #huggingface_model_path = r"C:\Users\user\Desktop\Langgraph+Pydantic_Test\ai_models\BioMistral-7B_Q4_K_M" # "BioMistral/BioMistral-7B" 
 embedding_model_name = "sentence-transformers/all-MiniLM-L6-v2" 
 
-print("Initializing Local Model Adapter through llama.cpp...")
-local_adapter = LocalModelAdapter(
-    llm_path=multipurpose_model_path,
-)
-
-print("Initializing EfficientNet-b0 model (skin lesion classifier) Adapter...")
-efficientnet_adapter = EfficientNetAdapter(
-    model_path="ai_models/skin_lesion_efficientnetb0.pth",
-)
-
-print("Initializing embedding model adapter...")
-embedder_adapter = EmbedderAdapter(
-    model_name=embedding_model_name,
-)
+#Adapters are built on first use (same on-demand approach as ModelManager), so importing
+#this module doesn't pull in llama.cpp/torch/sentence-transformers or allocate any model
+def _build_once(factory):
+    """Cache factory() behind its own lock (double-checked) so concurrent first calls build one adapter"""
+    lock = threading.Lock()
+    instance = None
+    
+    @functools.wraps(factory)
+    def getter():
+        nonlocal instance
+        if instance is None:
+            with lock:
+                if instance is None:
+                    instance = factory()
+        return instance
+    return getter
+
+@_build_once
+def get_local_adapter():
+    from adapters.local_model_adapter import LocalModelAdapter
+    return LocalModelAdapter(llm_path=multipurpose_model_path)
+
+@_build_once
+def get_efficientnet_adapter():
+    from adapters.skinlesion_efficientNet_adapter import EfficientNetAdapter
+    return EfficientNetAdapter(model_path="ai_models/skin_lesion_efficientnetb0.pth")
+
+@_build_once
+def get_embedder_adapter():
+    from adapters.embedder_adapter import EmbedderAdapter
+    return EmbedderAdapter(model_name=embedding_model_name)
+
+class LazyAdapter:
+    """Proxy handed to nodes; builds the real adapter on first attribute access"""
+    
+    def __init__(self, factory):
+        self._factory = factory
+    
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
 
-print("Adapters initialized.")
+local_adapter = LazyAdapter(get_local_adapter)
+efficientnet_adapter = LazyAdapter(get_efficientnet_adapter)
+embedder_adapter = LazyAdapter(get_embedder_adapter)
 
 #Initialize all callable node instances
 llm_diagnosis_node = LLMDiagnosisNode(adapter=local_adapter)
@@ -64,74 +95,93 @@ workflow.add_node("generate_report", medical_report_node)
 # Set entry point
 workflow.set_entry_point("llm_diagnosis")
 
+# Average textual-analysis confidence below which follow-up questions are asked
+CONFIDENCE_THRESHOLD = 0.6
+
+# Candidate lists at least this long are averaged with NumPy instead of a Python loop
+VECTORIZE_MIN_DIAGNOSES = 16
+
+def _average_confidence(textual_analysis: list) -> float:
+    """Mean diagnosis_confidence over the candidate diagnoses (missing/None count as 0)"""
+    count = len(textual_analysis)
+    if count < VECTORIZE_MIN_DIAGNOSES:
+        confidence_sum = 0.0
+        for diagnosis in textual_analysis:
+            confidence_sum += diagnosis.get("diagnosis_confidence") or 0.0
+        return confidence_sum / count
+    
+    confidences = np.fromiter(
+        (diagnosis.get("diagnosis_confidence") or 0.0 for diagnosis in textual_analysis),
+        dtype=np.float64,
+        count=count,
+    )
+    return float(confidences.mean())
+
 # Update routing functions to include healthcare recommendation
 def route_after_llm_diagnosis(state: AgentState) -> str:
     """Route after initial LLM diagnosis - simplified routing logic"""
     textual_analysis = state.get("textual_analysis", [])
     image_required = state.get("image_required", False)
     
-    CONFIDENCE_THRESHOLD = 0.6
     # Calculate average confidence from all diagnoses
+    average_confidence = 0.0
     if textual_analysis and isinstance(textual_analysis, list):
-        confidence_scores = [
-            diagnosis.get("diagnosis_confidence", 0.0) 
-            for diagnosis in textual_analysis
-        ]
-        average_confidence = sum(confidence_scores) / len(confidence_scores)
-    else:
-        average_confidence = 0.0
+        average_confidence = _average_confidence(textual_analysis)
     
     state["average_confidence"] = average_confidence  # Store for later use
-    state["workflow_path"] = [] #Track workflow path for overall analysis 
     
-    print(f"🔍 Average confidence: {average_confidence:.2f} (from {len(textual_analysis)} diagnoses)")
+    logger.debug("🔍 Average confidence: %.2f (from %d diagnoses)", average_confidence, len(textual_analysis or ()))
     
     # Priority 1: Check if confidence is low -> need follow-up questions
     if average_confidence < CONFIDENCE_THRESHOLD:
         state["workflow_path"] = ["textual_to_followup"]
-        print(f"📝 Low confidence ({average_confidence:.2f} < {CONFIDENCE_THRESHOLD}) - generating follow-up questions")
+        logger.debug("📝 Low confidence (%.2f < %s) - generating follow-up questions", average_confidence, CONFIDENCE_THRESHOLD)
         return "followup_interaction"
     
     # Priority 2: Check if image is required
     if image_required:
         state["workflow_path"] = ["textual_to_image"]
-        print("📸 Image required - routing to image analysis")
+        logger.debug("📸 Image required - routing to image analysis")
         return "image_analysis"
         
     # Priority 3: Go directly to overall analysis for high-confidence text-only cases
     state["workflow_path"] = ["textual_only"]
-    print("📋 High confidence - routing to overall analysis")
+    logger.debug("📋 High confidence - routing to overall analysis")
     return "overall_analysis_step"
 
+# (requires_user_input, has followup_response, image_required) -> (next node, workflow_path step to append, debug message)
+_FOLLOWUP_ROUTE_TABLE = {
+    # First time - waiting for input
+    (True, False, False): (END, None, "⏸️ Waiting for user input - pausing workflow"),
+    (True, False, True): (END, None, "⏸️ Waiting for user input - pausing workflow"),
+    # We have responses - call the node again for processing them
+    (True, True, False): ("followup_interaction", None, "🔄 Processing user responses"),
+    (True, True, True): ("followup_interaction", None, "🔄 Processing user responses"),
+    # **WORKFLOW INSTANCE 3: Textual -> Follow-up Only**
+    (False, False, False): ("overall_analysis_step", "followup_only", "📋 Follow-up completed - routing to overall analysis"),
+    (False, True, False): ("overall_analysis_step", "followup_only", "📋 Follow-up completed - routing to overall analysis"),
+    # **WORKFLOW INSTANCE 4: Textual -> Follow-up -> Image**
+    (False, False, True): ("image_analysis", "followup_to_image", "📸 Follow-up completed - routing to image analysis"),
+    (False, True, True): ("image_analysis", "followup_to_image", "📸 Follow-up completed - routing to image analysis"),
+}
+
+def _extend_workflow_path(state: AgentState, step: str) -> None:
+    """Append a routing step to the state's workflow_path (always stored as a list)"""
+    state["workflow_path"] = [*(state.get("workflow_path") or ()), step]
+
 def route_after_followup_interaction(state: AgentState) -> str:
-    """Route after follow-up interaction - simplified routing logic"""
-    followup_response = state.get("followup_response", {})
+    """Route after follow-up interaction - table-driven routing logic"""
+    key = (
+        bool(state.get("requires_user_input")),
+        bool(state.get("followup_response")),
+        bool(state.get("image_required")),
+    )
+    next_node, path_step, message = _FOLLOWUP_ROUTE_TABLE[key]
     
-    if state.get("requires_user_input", False) and not followup_response:
-        # First time - waiting for input
-        print("⏸️ Waiting for user input - pausing workflow")
-        return END
-    elif followup_response and state.get("requires_user_input", False):
-        # We have responses - continue to process them
-        print("🔄 Processing user responses")
-        return "followup_interaction"  # Call the node again for processing responses
-
-    # Check if image is required after follow-up
-    image_required = state.get("image_required", False)
-    workflow_path = state.get("workflow_path", [])
-    
-    if image_required:
-        # **WORKFLOW INSTANCE 4: Textual -> Follow-up -> Image**
-        workflow_path.append("followup_to_image")
-        state["workflow_path"] = workflow_path
-        print("📸 Follow-up completed - routing to image analysis")
-        return "image_analysis"
-    else:
-        # **WORKFLOW INSTANCE 3: Textual -> Follow-up Only**
-        workflow_path.append("followup_only")
-        state["workflow_path"] = workflow_path
-        print("📋 Follow-up completed - routing to overall analysis")
-        return "overall_analysis_step"
+    if path_step is not None:
+        _extend_workflow_path(state, path_step)
+    logger.debug(message)
+    return next_node
 
 # Update workflow routing
 workflow.add_conditional_edges(
@@ -160,7 +210,8 @@ workflow.add_edge("overall_analysis_step", "healthcare_recommendation_step")
 workflow.add_edge("healthcare_recommendation_step", "generate_report")
 workflow.add_edge("generate_report", END) 
 
-# Compile the workflow
+# Compile the workflow once at import. No checkpointer is attached, so AgentState is handed
+# between nodes as the same in-memory dict and never serialized on graph edges.
 patient_app = workflow.compile()
 
-print("Patient workflow graph compiled successfully!")
\ No newline at end of file
+logger.info("Patient workflow graph compiled successfully!")
\ No newline at end of file
@@ -1,6 +1,7 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 import json
 import logging
 from datetime import datetime
@@ -11,7 +12,6 @@ from api.diagnosis_routes import diagnosis_router
 from api.auth_routes import router as auth_router
 from managers.websocket_manager import ConnectionManager
 from managers.model_manager import model_manager #Global variable to initiallize models here in main.py and carry over to diagnosis_routes.py for model usage
-from nodes import LLMDiagnosisNode, ImageClassificationNode, FollowUpInteractionNode, OverallAnalysisNode, MedicalReportNode 
 from contextlib import asynccontextmanager
 
 load_dotenv()
@@ -34,13 +34,16 @@ async def lifespan(app: FastAPI):
         model_info = await model_manager.load_all_models()
         print(f"📊 Model loading summary:")
         print(f"   • Total load time: {model_info['load_time_seconds']}s")
-        print(f"   • LLM model loaded: {model_info['local_adapter_loaded']}")
-        print(f"   • Skin model: On-demand loading")  
-        print(f"   • Embedding model: On-demand loading")  
+        print(f"   • LLM model loaded: {model_info['bedrock_adapter_loaded']}")
+        print(f"   • Skin model: {'Loaded' if model_info['skin_adapter_loaded'] else 'On-demand loading'}")  
+        print(f"   • Embedding model: {'Loaded' if model_info['embedding_adapter_loaded'] else 'On-demand loading'}")  
         
-        from api.diagnosis_routes import initialize_nodes_once
-        initialize_nodes_once()
-        print("✅ All nodes initialized with pre-loaded models!")
+        if model_info['bedrock_adapter_loaded']:
+            from api.diagnosis_routes import initialize_nodes_once
+            await initialize_nodes_once()
+            print("✅ All nodes initialized with pre-loaded models!")
+        else:
+            print("📋 LLM not preloaded - nodes will be initialized on the first request")
     except Exception as e:
         print(f"❌ Model loading failed: {e}")
         print("⚠️ API will start but models may not be available")
@@ -62,11 +65,13 @@ app = FastAPI(
     title="AI Medical Diagnosis Assistant",
     description="Medical AI system with LangGraph workflow",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  # orjson-backed JSON for all route responses
 )
 
 # Middleware setup
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Small health/status JSON stays uncompressed; level 1 keeps gzip cheap on larger report payloads
+app.add_middleware(GZipMiddleware, minimum_size=4096, compresslevel=1)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  # Allow all origins for testing
@@ -85,7 +90,7 @@ manager = ConnectionManager()
 # # WebSocket endpoint (keep in main.py as it's core infrastructure)
 # @app.websocket("/ws/{session_id}")
 # async def websocket_endpoint(websocket: WebSocket, session_id: str):
-#     await manager.connect(websocket, session_id)
+#     await manager.connect(websocket, session_id, batch=websocket.query_params.get("batch") == "1")
 #     try:
 #         while True:
 #             # Keep connection alive and listen for client messages
@@ -102,10 +107,10 @@ manager = ConnectionManager()
 #                 await send_workflow_status(session_id)
             
 #     except WebSocketDisconnect:
-#         manager.disconnect(session_id)
+#         await manager.disconnect(session_id)
 #     except Exception as e:
 #         print(f"❌ WebSocket error for {session_id}: {e}")
-#         manager.disconnect(session_id)
+#         await manager.disconnect(session_id)
 
 async def send_workflow_status(session_id: str):
     """Send current workflow status to client"""
@@ -1,39 +1,78 @@
 import asyncio
 import logging
 import os
+import threading
 import time
-from typing import Optional, Dict, Any
-from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Mapping, Tuple
+
+import boto3
 
 from adapters.bedrock_model_adapter import BedrockModelAdapter
-from adapters.skinlesion_efficientNet_adapter import EfficientNetAdapter
-from adapters.embedder_adapter import EmbedderAdapter
+from adapters.embedder_adapter import EmbedderAdapter, BatchingEmbedder
+
+if TYPE_CHECKING:
+    # Pulls in torch/timm; imported lazily in load_all_models
+    from adapters.skinlesion_efficientNet_adapter import EfficientNetAdapter
 
 logger = logging.getLogger(__name__)
 
 MODEL_ID = "us.meta.llama3-1-8b-instruct-v1:0"
 
+# Models that can be loaded at startup; anything not listed in PRELOAD_MODELS loads on first use
+PRELOADABLE_MODELS = ("bedrock", "skin", "embedding")
+
+# Heavy ML libraries imported on a background thread so their shared-library loading overlaps API startup
+BACKGROUND_IMPORTS = ("torch", "torchvision", "timm", "sentence_transformers")
+
+def _import_in_background():
+    """Import heavy ML modules off the main thread; later imports are then sys.modules hits"""
+    for module_name in BACKGROUND_IMPORTS:
+        try:
+            __import__(module_name)
+        except Exception as e:
+            logger.debug(f"Background import of {module_name} failed: {e}")
+
+# Block size used when pre-reading weight files into the OS page cache
+PREFETCH_BLOCK_SIZE = 16 * 1024 * 1024
+
+def _advise_willneed(path: str) -> Optional[int]:
+    """Ask the kernel to start readahead for a whole file; returns the open fd (None if unavailable)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None  # Best-effort: missing/unreadable files are simply skipped
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    return fd
+
+def _read_into_page_cache(path: str) -> int:
+    """Read a file in large blocks and discard the data so later loads hit a warm page cache"""
+    read_bytes = 0
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            while chunk := f.read(PREFETCH_BLOCK_SIZE):
+                read_bytes += len(chunk)
+    except OSError:
+        pass  # Best-effort: missing/unreadable files are simply skipped
+    return read_bytes
+
 class ModelManager:
-    """Singleton model manager to ensure models are loaded only once"""
-    
-    _instance: 'ModelManager' = None
-    _lock = Lock()
-    
-    def __new__(cls) -> 'ModelManager':
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super().__new__(cls)
-        return cls._instance
+    """Model manager to ensure models are loaded only once (use the module-level model_manager instance)"""
     
     def __init__(self):
-        # Only initialize once
-        if hasattr(self, '_initialized'):
-            return
-            
-        self._initialized = True
-        self._models_loaded = False
+        # Set once load_all_models has finished; readers check it without taking a lock
+        self._ready = asyncio.Event()
+        # Per-model load flags, mirrored from each adapter's is_loaded after a successful load
+        self._load_state: Dict[str, bool] = dict.fromkeys(PRELOADABLE_MODELS, False)
         self._loading_lock = asyncio.Lock()
+        # One lock per on-demand model so concurrent first requests share a single load
+        self._bedrock_lock = asyncio.Lock()
+        self._skin_lock = asyncio.Lock()
+        self._embedding_lock = asyncio.Lock()
         
         # Bedrock configuration with credential handling
         self.bedrock_model_id = MODEL_ID
@@ -44,21 +83,37 @@ class ModelManager:
         self.aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         self.aws_region = os.getenv('AWS_DEFAULT_REGION', self.bedrock_region)
         
+        # Cached result of the credential provider chain lookup (None = not checked yet)
+        self._aws_credentials_ok: Optional[bool] = None
+        
         # Local model paths for other adapters
         self.skin_model_path = "ai_models/skin_lesion_efficientnetb0.pth"
         self.embedding_model_name = "sentence-transformers/all-MiniLM-L6-v2"
         
+        # Models loaded eagerly at startup, e.g. PRELOAD_MODELS="" for fully lazy or "bedrock,skin,embedding".
+        # PREWARM_ALL_MODELS=1 is kept as a shorthand for preloading everything.
+        self.preload_models: List[str] = self._parse_preload_models()
+        
         # Adapter instances (will be created once)
         self.bedrock_adapter: Optional[BedrockModelAdapter] = None
-        self.efficientnet_adapter: Optional[EfficientNetAdapter] = None
-        self.embedder_adapter: Optional[EmbedderAdapter] = None
+        self.efficientnet_adapter: Optional['EfficientNetAdapter'] = None
+        self.embedder_adapter: Optional[BatchingEmbedder] = None
         
         # Loading stats
         self.load_start_time: Optional[float] = None
         self.load_end_time: Optional[float] = None
         
+        # Blocking torch/sentence-transformers loads run here so they overlap instead of stalling the event loop
+        self._load_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-load")
+        
+        # Last _get_model_info() result with the state it was built from (adapter ids + load flags)
+        self._info_cache: Optional[Tuple[tuple, Mapping[str, Any]]] = None
+        
         logger.info("🏗️ ModelManager singleton created (Bedrock-enabled)")
         
+        # Start loading torch & co. now so it overlaps FastAPI startup
+        threading.Thread(target=_import_in_background, name="model-imports", daemon=True).start()
+        
         # Check credentials availability
         if self.aws_access_key and self.aws_secret_key:
             logger.info("✅ AWS credentials found in environment")
@@ -66,20 +121,42 @@ class ModelManager:
             logger.warning("⚠️ AWS credentials not found in environment variables")
             logger.info("💡 Set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY environment variables")
     
-    async def load_all_models(self) -> Dict[str, Any]:
-        """Load only Bedrock LLM model initially. Skin/embedding models loaded on demand."""
+    @staticmethod
+    def _parse_preload_models() -> List[str]:
+        """Read the preload list from PRELOAD_MODELS (default: Bedrock only)"""
+        if os.getenv('PREWARM_ALL_MODELS') == '1':
+            return list(PRELOADABLE_MODELS)
+        
+        requested = [name.strip() for name in os.getenv('PRELOAD_MODELS', 'bedrock').split(',') if name.strip()]
+        unknown = [name for name in requested if name not in PRELOADABLE_MODELS]
+        if unknown:
+            logger.warning(f"⚠️ Ignoring unknown PRELOAD_MODELS entries: {unknown}")
+        return [name for name in PRELOADABLE_MODELS if name in requested]
+    
+    async def load_all_models(self) -> Mapping[str, Any]:
+        """Create adapters and load the models in preload_models; everything else loads on first use."""
+        
+        # Lock-free fast path once startup has finished; the lock only guards the first load
+        if self._ready.is_set():
+            return self._get_model_info()
         
         async with self._loading_lock:
-            if self._models_loaded:
+            if self._ready.is_set():
                 logger.info("✅ Models already loaded, returning existing instances")
                 return self._get_model_info()
             
             logger.info("🚀 Starting model loading process...")
+            loop_type = type(asyncio.get_running_loop())
+            logger.info(f"🔁 Event loop: {loop_type.__module__}.{loop_type.__name__}")
             self.load_start_time = time.time()
             
+            # Warm the page cache for local weight files while adapters are being set up
+            prefetch_task = asyncio.create_task(self._prefetch_weights())
+            
             try:
                 # Check credentials before creating adapter
-                if not self._check_aws_credentials():
+                # Credential lookup may touch ~/.aws or the instance metadata service, keep it off the loop
+                if not await asyncio.to_thread(self._check_aws_credentials):
                     logger.warning("⚠️ AWS credentials not configured, but continuing with adapter creation")
                 
                 # Create Bedrock adapter (cloud-based, always needed)
@@ -90,21 +167,41 @@ class ModelManager:
                     region_name=self.aws_region
                 )
                 
-                # Only load Bedrock model initially
-                logger.info("⏳ Loading Bedrock LLM model...")
-                await self._load_bedrock_model()
-                
-                # Create other adapters but don't load them yet
-                logger.info("📦 Creating skin and embedding adapters (not loading yet)...")
+                # Create other adapters (loaded on demand unless prewarming)
+                logger.info("📦 Creating skin and embedding adapters...")
+                from adapters.skinlesion_efficientNet_adapter import EfficientNetAdapter
                 self.efficientnet_adapter = EfficientNetAdapter(model_path=self.skin_model_path)
-                self.embedder_adapter = EmbedderAdapter(model_name=self.embedding_model_name)
+                # Embedder is wrapped so concurrent requests share batched forward passes
+                self.embedder_adapter = BatchingEmbedder(EmbedderAdapter(model_name=self.embedding_model_name))
+                
+                loaders = {
+                    "bedrock": self._load_bedrock_model,
+                    "skin": self._load_skin_model,
+                    "embedding": self._load_embedding_model,
+                }
+                logger.info(f"⏳ Preloading models: {self.preload_models or 'none (all on demand)'}")
+                async with asyncio.TaskGroup() as tg:
+                    load_tasks = {
+                        name: tg.create_task(self._guarded_load(loaders[name]()))
+                        for name in self.preload_models
+                    }
+                
+                # A preloaded LLM that fails keeps the API unavailable; other preloads retry on demand
+                if "bedrock" in load_tasks and (bedrock_error := load_tasks["bedrock"].result()):
+                    raise bedrock_error
+                for name, task in load_tasks.items():
+                    if task.result():
+                        logger.warning(f"⚠️ {name} model preload failed, will retry on demand")
                 
                 self.load_end_time = time.time()
-                self._models_loaded = True
+                self._ready.set()
+                self._info_cache = None
                 
                 load_time = self.load_end_time - self.load_start_time
-                logger.info(f"✅ Bedrock LLM model loaded successfully in {load_time:.2f}s")
-                logger.info("📋 Skin and embedding models will be loaded on demand")
+                logger.info(f"✅ Model manager ready in {load_time:.2f}s")
+                lazy_models = [name for name in PRELOADABLE_MODELS if name not in self.preload_models]
+                if lazy_models:
+                    logger.info(f"📋 Models loaded on demand: {lazy_models}")
                 
                 return self._get_model_info()
                 
@@ -113,16 +210,66 @@ class ModelManager:
                 # Don't raise exception - let API start without models
                 logger.warning("⚠️ API will start but Bedrock model will not be available")
                 return self._get_model_info()
+            
+            finally:
+                # Readahead fds stay open for the duration of loading, then are released
+                for fd in await prefetch_task:
+                    os.close(fd)
+    
+    @staticmethod
+    async def _guarded_load(load_coro) -> Optional[Exception]:
+        """Await a model load, returning its exception instead of raising so TaskGroup siblings keep running"""
+        try:
+            await load_coro
+        except Exception as e:
+            return e
+        return None
+    
+    def _weight_files(self) -> List[str]:
+        """Local weight files for the skin and embedding models (HF hub cache layout)"""
+        files = [self.skin_model_path]
+        
+        hub_cache = os.getenv('HF_HUB_CACHE') or os.path.join(
+            os.getenv('HF_HOME', os.path.expanduser('~/.cache/huggingface')), 'hub'
+        )
+        embedding_dir = os.path.join(hub_cache, 'models--' + self.embedding_model_name.replace('/', '--'))
+        for root, _, names in os.walk(os.path.join(embedding_dir, 'blobs')):
+            files.extend(os.path.join(root, name) for name in names)
+        
+        return files
+    
+    async def _prefetch_weights(self) -> List[int]:
+        """Warm the page cache for local weight files, best-effort. Returns fds to close after loading."""
+        try:
+            files = await asyncio.to_thread(self._weight_files)
+            
+            if hasattr(os, 'posix_fadvise'):
+                # Kernel-side readahead: no bytes copied through this process
+                fds = await asyncio.to_thread(lambda: [fd for fd in map(_advise_willneed, files) if fd is not None])
+                logger.info(f"📥 Requested kernel readahead for {len(fds)} model weight files")
+                return fds
+            
+            # No fadvise on this platform: pre-read concurrently (one worker thread per file)
+            sizes = await asyncio.gather(*(asyncio.to_thread(_read_into_page_cache, path) for path in files))
+            logger.info(f"📥 Prefetched {sum(sizes) / (1024 * 1024):.1f} MiB of model weights into page cache")
+        except Exception as e:
+            logger.debug(f"Weight prefetch skipped: {e}")
+        return []
     
     def _check_aws_credentials(self) -> bool:
-        """Check if AWS credentials are available"""
+        """Check if AWS credentials are available (cached until cleanup())"""
+        if self._aws_credentials_ok is None:
+            self._aws_credentials_ok = self._lookup_aws_credentials()
+        return self._aws_credentials_ok
+    
+    def _lookup_aws_credentials(self) -> bool:
+        """Resolve AWS credentials from the environment or the boto3 provider chain"""
         # Check environment variables
         if os.getenv('AWS_ACCESS_KEY_ID') and os.getenv('AWS_SECRET_ACCESS_KEY'):
             return True
         
         # Check if AWS CLI is configured
         try:
-            import boto3
             session = boto3.Session()
             credentials = session.get_credentials()
             if credentials and credentials.access_key and credentials.secret_key:
@@ -134,99 +281,132 @@ class ModelManager:
         return False
 
     async def _load_bedrock_model(self):
-        """Load Bedrock model with error handling"""
-        try:
-            logger.info("🧠 Loading Bedrock LLM model...")
-            await self.bedrock_adapter.load_model()
-            logger.info("✅ Bedrock LLM model loaded")
-        except Exception as e:
-            logger.error(f"❌ Bedrock LLM model loading failed: {e}")
-            raise  
+        """Load Bedrock model with error handling (concurrent first requests share one load)"""
+        async with self._bedrock_lock:
+            if self._load_state["bedrock"]:
+                return
+            try:
+                logger.info("🧠 Loading Bedrock LLM model...")
+                await self.bedrock_adapter.load_model()
+                self._load_state["bedrock"] = self.bedrock_adapter.is_loaded
+                logger.info("✅ Bedrock LLM model loaded")
+            except Exception as e:
+                logger.error(f"❌ Bedrock LLM model loading failed: {e}")
+                raise
     
     async def _load_skin_model(self):
-        """Load skin lesion model on demand"""
-        try:
-            if not hasattr(self.efficientnet_adapter, 'model') or self.efficientnet_adapter.model is None:
+        """Load skin lesion model on demand (concurrent first requests share one load)"""
+        async with self._skin_lock:
+            if self._load_state["skin"]:
+                return
+            try:
                 logger.info("🔬 Loading skin lesion model on demand...")
-                await self.efficientnet_adapter.load_model()
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self._load_executor, self.efficientnet_adapter.load_model_sync)
+                self._load_state["skin"] = self.efficientnet_adapter.is_loaded
                 logger.info("✅ Skin lesion model loaded")
-        except Exception as e:
-            logger.error(f"❌ Skin lesion model loading failed: {e}")
-            raise
+            except Exception as e:
+                logger.error(f"❌ Skin lesion model loading failed: {e}")
+                raise
     
     async def _load_embedding_model(self):
-        """Load embedding model on demand"""
-        try:
-            if not hasattr(self.embedder_adapter, 'model') or self.embedder_adapter.model is None:
+        """Load embedding model on demand (concurrent first requests share one load)"""
+        async with self._embedding_lock:
+            if self._load_state["embedding"]:
+                return
+            try:
                 logger.info("📊 Loading embedding model on demand...")
-                await self.embedder_adapter.load_model()
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self._load_executor, self.embedder_adapter.load_model_sync)
+                self._load_state["embedding"] = self.embedder_adapter.is_loaded
                 logger.info("✅ Embedding model loaded")
-        except Exception as e:
-            logger.error(f"❌ Embedding model loading failed: {e}")
-            raise
+            except Exception as e:
+                logger.error(f"❌ Embedding model loading failed: {e}")
+                raise
     
-    def _get_model_info(self) -> Dict[str, Any]:
-        """Get model loading information"""
+    def _get_model_info(self) -> Mapping[str, Any]:
+        """Get model loading information (read-only snapshot, cached until adapters or load flags change)"""
+        credentials_ok = self._check_aws_credentials()
+        key = (
+            id(self.bedrock_adapter), id(self.efficientnet_adapter), id(self.embedder_adapter),
+            self._ready.is_set(), *self._load_state.values(),
+            credentials_ok, self.load_end_time,
+        )
+        if self._info_cache is not None and self._info_cache[0] == key:
+            return self._info_cache[1]
+        
         load_time = (self.load_end_time - self.load_start_time) if self.load_start_time and self.load_end_time else 0
         
-        return {
-            "models_loaded": self._models_loaded,
+        # Frozen so callers sharing the cached snapshot can't alter it for each other
+        info = MappingProxyType({
+            "models_loaded": self._ready.is_set(),
             "load_time_seconds": round(load_time, 2),
-            "bedrock_adapter_loaded": self.bedrock_adapter is not None and hasattr(self.bedrock_adapter, 'client') and self.bedrock_adapter.client is not None,
-            "skin_adapter_loaded": self.efficientnet_adapter is not None and hasattr(self.efficientnet_adapter, 'model') and self.efficientnet_adapter.model is not None,
-            "embedding_adapter_loaded": self.embedder_adapter is not None and hasattr(self.embedder_adapter, 'model') and self.embedder_adapter.model is not None,
-            "aws_credentials_available": self._check_aws_credentials(),
-            "adapters": {
+            "bedrock_adapter_loaded": self._load_state["bedrock"],
+            "skin_adapter_loaded": self._load_state["skin"],
+            "embedding_adapter_loaded": self._load_state["embedding"],
+            "aws_credentials_available": credentials_ok,
+            "adapters": MappingProxyType({
                 "bedrock": self.bedrock_adapter,
                 "efficientnet": self.efficientnet_adapter,
                 "embedder": self.embedder_adapter
-            },
-            "bedrock_config": {
+            }),
+            "preload_models": tuple(self.preload_models),
+            "bedrock_config": MappingProxyType({
                 "model_id": self.bedrock_model_id,
                 "region": self.aws_region
-            }
-        }
+            })
+        })
+        self._info_cache = (key, info)
+        return info
     
-    def get_bedrock_adapter(self) -> Optional[BedrockModelAdapter]:
-        """Get the Bedrock LLM adapter instance"""
-        if not self._models_loaded:
+    async def get_bedrock_adapter(self) -> Optional[BedrockModelAdapter]:
+        """Get the Bedrock LLM adapter instance (load on demand)"""
+        if not self._ready.is_set():
             logger.warning("⚠️ Models not loaded yet. Call load_all_models() first.")
             return None
+        
+        # Load on demand
+        if not self._load_state["bedrock"]:
+            try:
+                await self._load_bedrock_model()
+            except Exception:
+                return None
+        
         return self.bedrock_adapter
     
     # Alias for backward compatibility
-    def get_local_adapter(self) -> Optional[BedrockModelAdapter]:
+    async def get_local_adapter(self) -> Optional[BedrockModelAdapter]:
         """Get the LLM adapter instance (now Bedrock-based) - backward compatibility"""
         logger.info("ℹ️ get_local_adapter() is deprecated. Use get_bedrock_adapter() instead.")
-        return self.get_bedrock_adapter()
+        return await self.get_bedrock_adapter()
     
-    async def get_efficientnet_adapter(self) -> Optional[EfficientNetAdapter]:
+    async def get_efficientnet_adapter(self) -> Optional['EfficientNetAdapter']:
         """Get the skin lesion adapter instance (load on demand)"""
-        if not self._models_loaded:
+        if not self._ready.is_set():
             logger.warning("⚠️ Models not loaded yet. Call load_all_models() first.")
             return None
         
         # Load on demand
-        if not hasattr(self.efficientnet_adapter, 'model') or self.efficientnet_adapter.model is None:
+        if not self._load_state["skin"]:
             await self._load_skin_model()
         
         return self.efficientnet_adapter
     
-    async def get_embedder_adapter(self) -> Optional[EmbedderAdapter]:
+    async def get_embedder_adapter(self) -> Optional[BatchingEmbedder]:
         """Get the embedding adapter instance (load on demand)"""
-        if not self._models_loaded:
+        if not self._ready.is_set():
             logger.warning("⚠️ Models not loaded yet. Call load_all_models() first.")
             return None
         
         # Load on demand
-        if not hasattr(self.embedder_adapter, 'model') or self.embedder_adapter.model is None:
+        if not self._load_state["embedding"]:
             await self._load_embedding_model()
         
         return self.embedder_adapter
     
     def is_loaded(self) -> bool:
         """Check if models are loaded"""
-        return self._models_loaded
+        return self._ready.is_set()
     
     def get_bedrock_config(self) -> Dict[str, str]:
         """Get Bedrock configuration"""
@@ -251,11 +431,19 @@ class ModelManager:
             await self.efficientnet_adapter.cleanup()
             
         if self.embedder_adapter:
-            # Add cleanup method to EmbedderAdapter if needed
+            # Stops the batching task as well as releasing the model
+            await self.embedder_adapter.cleanup()
             logger.info("📊 Embedder adapter cleanup complete")
         
-        self._models_loaded = False
+        # Release the loader threads; a fresh (lazily threaded) executor keeps the manager reloadable
+        self._load_executor.shutdown(wait=False)
+        self._load_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-load")
+        
+        self._ready.clear()
+        self._load_state = dict.fromkeys(PRELOADABLE_MODELS, False)
+        self._aws_credentials_ok = None
+        self._info_cache = None
         logger.info("✅ Model cleanup complete")
 
-# Global instance
+# Global instance - the single ModelManager shared by main.py, routes and nodes
 model_manager = ModelManager()
\ No newline at end of file
@@ -1,40 +1,132 @@
 from fastapi import WebSocket
-import json
+import asyncio
+import functools
+import orjson
 from datetime import datetime
-from typing import Dict
+from typing import Any, Callable, Dict, List, Optional
+
+# Pre-serialized frame for the fixed-shape node_started / node_progress events.
+# Only node, message and timestamp change between sends, so they are spliced in directly.
+_NODE_EVENT_TEMPLATE = '{"type": "%s", "node": %s, "message": %s, "timestamp": "%s"}'
+_CONNECTION_ESTABLISHED_TEMPLATE = (
+    '{"type": "connection_established", "session_id": %s, "timestamp": "%s", '
+    '"message": "Connected to AI Medical Diagnosis System"}'
+)
+
+# Envelope for sessions that opted into batching; always used for them, even for a single message
+_BATCH_TEMPLATE = '{"type": "batch", "messages": [%s]}'
+
+# Messages queued within this window (seconds) of each other go out as one batch frame
+COALESCE_WINDOW = 0.001
+
+# How long (seconds) disconnect waits for queued messages to be sent before closing the session
+DISCONNECT_FLUSH_TIMEOUT = 1.0
+
+# How often (seconds) the cached frame timestamp is refreshed
+TIMESTAMP_REFRESH_INTERVAL = 1.0
 
 class ConnectionManager:
+    __slots__ = (
+        "active_connections", "session_workflows", "_outboxes", "_drainers", "_now_str", "_ticker", "_encode"
+    )
+    
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
         self.session_workflows: Dict[str, dict] = {}
+        # Per-session outgoing frames and the task draining them onto the socket
+        self._outboxes: Dict[str, asyncio.Queue] = {}
+        self._drainers: Dict[str, asyncio.Task] = {}
+        # ISO timestamp stamped on template frames, refreshed by _tick while sessions are connected
+        self._now_str: str = datetime.now().isoformat()
+        self._ticker: Optional[asyncio.Task] = None
+        # orjson encoder shared by every send; numpy scalars/arrays from model outputs serialize natively
+        self._encode: Callable[[Any], bytes] = functools.partial(
+            orjson.dumps, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
     
-    async def connect(self, websocket: WebSocket, session_id: str):
+    async def connect(self, websocket: WebSocket, session_id: str, batch: bool = False):
+        """Register a session; with batch=True every frame is a {"type": "batch", "messages": [...]} envelope"""
         await websocket.accept()
         self.active_connections[session_id] = websocket
+        outbox = self._outboxes[session_id] = asyncio.Queue()
+        self._drainers[session_id] = asyncio.create_task(self._drain(session_id, websocket, outbox, batch))
+        if self._ticker is None or self._ticker.done():
+            self._now_str = datetime.now().isoformat()
+            self._ticker = asyncio.create_task(self._tick())
         print(f"🔌 WebSocket connected: {session_id}")
         
-        # Send connection confirmation
-        await self.send_message(session_id, {
-            "type": "connection_established",
-            "session_id": session_id,
-            "timestamp": datetime.now().isoformat(),
-            "message": "Connected to AI Medical Diagnosis System"
-        })
-    
-    def disconnect(self, session_id: str):
-        if session_id in self.active_connections:
-            del self.active_connections[session_id]
-        if session_id in self.session_workflows:
-            del self.session_workflows[session_id]
+        # Send connection confirmation (static frame, only session_id and timestamp vary)
+        self._enqueue(session_id, _CONNECTION_ESTABLISHED_TEMPLATE % (
+            orjson.dumps(session_id).decode(), self._now_str
+        ))
+    
+    async def disconnect(self, session_id: str):
+        # Stop accepting new messages, then give the drainer a moment to send what is already queued
+        outbox = self._outboxes.pop(session_id, None)
+        drainer = self._drainers.get(session_id)
+        if outbox is not None and drainer is not None and not drainer.done():
+            try:
+                await asyncio.wait_for(outbox.join(), DISCONNECT_FLUSH_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"⚠️ Dropped {outbox.qsize()} unsent message(s) for {session_id}")
+        self._close(session_id)
+    
+    def _close(self, session_id: str):
+        """Forget the session and stop its drainer without flushing"""
+        self.active_connections.pop(session_id, None)
+        self.session_workflows.pop(session_id, None)
+        self._outboxes.pop(session_id, None)
+        drainer = self._drainers.pop(session_id, None)
+        if drainer is not None and drainer is not asyncio.current_task():
+            drainer.cancel()
+        if not self.active_connections and self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
         print(f"🔌 WebSocket disconnected: {session_id}")
     
     async def send_message(self, session_id: str, message: dict):
-        if session_id in self.active_connections:
+        self._enqueue(session_id, self._encode(message).decode())
+    
+    async def send_node_event(self, session_id: str, event_type: str, node: str, message: str):
+        """Send a node_started/node_progress frame built from the pre-serialized template"""
+        if session_id in self._outboxes:
+            self._enqueue(session_id, _NODE_EVENT_TEMPLATE % (
+                event_type, orjson.dumps(node).decode(), orjson.dumps(message).decode(), self._now_str
+            ))
+    
+    async def _tick(self):
+        """Refresh the cached timestamp so frames don't format datetime.now() individually"""
+        while True:
+            await asyncio.sleep(TIMESTAMP_REFRESH_INTERVAL)
+            self._now_str = datetime.now().isoformat()
+    
+    def _enqueue(self, session_id: str, frame: str):
+        """Queue a serialized message for the session's drainer (dropped if the session is gone)"""
+        outbox = self._outboxes.get(session_id)
+        if outbox is not None:
+            outbox.put_nowait(frame)
+    
+    async def _drain(self, session_id: str, websocket: WebSocket, outbox: asyncio.Queue, batch: bool):
+        """Send queued messages one frame each, or as batch envelopes of back-to-back messages if the session opted in"""
+        while True:
+            frames: List[str] = [await outbox.get()]
+            if batch:
+                await asyncio.sleep(COALESCE_WINDOW)
+                while not outbox.empty():
+                    frames.append(outbox.get_nowait())
+                text = _BATCH_TEMPLATE % ",".join(frames)
+            else:
+                text = frames[0]
             try:
-                await self.active_connections[session_id].send_text(json.dumps(message))
+                await websocket.send_text(text)
             except Exception as e:
                 print(f"❌ Failed to send message to {session_id}: {e}")
-                self.disconnect(session_id)
+                self._close(session_id)
+                return
+            finally:
+                # Lets disconnect() know these frames are no longer pending
+                for _ in frames:
+                    outbox.task_done()
     
     async def broadcast_to_session(self, session_id: str, message: dict):
         """Send message to specific session (future: can broadcast to multiple users)"""
@@ -1,265 +1,291 @@
 from schemas.medical_schemas import AgentState
-from typing import Optional, Dict, Any
+from typing import Callable, Optional, Dict, Any
+from statistics import fmean
+from functools import lru_cache
+from types import MappingProxyType
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Candidate lists at least this long are averaged with NumPy instead of statistics.fmean
+VECTORIZE_MIN_DIAGNOSES = 64
+
+# Read-only response skeletons shared by every stage response (copied into each returned dict)
+_RESPONSE_DEFAULTS = MappingProxyType({"workflow_complete": False, "show_next_button": True})
+_TERMINAL_RESPONSE = MappingProxyType({"workflow_complete": True, "show_next_button": False})
+
 class WorkflowStateManager:
     """Centralized workflow state management for all workflow stages"""
     
+    __slots__ = ("CONFIDENCE_THRESHOLD", "_stage_handlers")
+    
+    # (state key, completed stage name, data source or None) checked in order by the workflow summary
+    _STAGE_CHECKS = (
+        ("textual_analysis", "textual_analysis", "symptoms"),
+        ("followup_diagnosis", "followup_analysis", "followup_questions"),
+        ("skin_lesion_analysis", "image_analysis", "medical_image"),
+        ("overall_analysis", "overall_analysis", None),
+        ("healthcare_recommendation", "healthcare_recommendations", None),
+        ("medical_report", "medical_report", None),
+    )
+    
     def __init__(self):
-        self.CONFIDENCE_THRESHOLD = 0.75
+        self.CONFIDENCE_THRESHOLD: float = 0.75
+        
+        # completed_node -> stage handler (O(1) dispatch instead of an if/elif chain)
+        self._stage_handlers: Dict[str, Callable[[AgentState], Dict[str, Any]]] = {
+            "textual_analysis": self._handle_textual_analysis,
+            "followup_interaction": self._handle_followup_interaction,
+            "image_analysis": self._handle_image_analysis,
+            "overall_analysis": self._handle_overall_analysis,
+            "generate_report": self._handle_medical_report,
+            "medical_report": self._handle_medical_report,
+        }
     
     def calculate_average_confidence(self, state: AgentState) -> float:
         """Calculate average confidence from textual analysis"""
         textual_analysis = state.get("textual_analysis", [])
-        if textual_analysis and isinstance(textual_analysis, list):
-            confidence_scores = [
-                diagnosis.get("diagnosis_confidence", 0.0) 
-                for diagnosis in textual_analysis
-            ]
-                
-        return sum(confidence_scores) / len(confidence_scores)
+        if not textual_analysis or not isinstance(textual_analysis, list):
+            return 0.0
+        
+        confidence_scores = (diagnosis.get("diagnosis_confidence") or 0.0 for diagnosis in textual_analysis)
+        if len(textual_analysis) >= VECTORIZE_MIN_DIAGNOSES:
+            return float(np.fromiter(confidence_scores, dtype=np.float64, count=len(textual_analysis)).mean())
+        return fmean(confidence_scores)
 
     
     def update_workflow_stage_and_determine_next(self, state: AgentState, completed_node: str) -> dict[str, Any]:
         """Update workflow stage and determine next endpoint for ALL stages"""
+        handler = self._stage_handlers.get(completed_node)
+        if handler is None:
+            return self._handle_unknown_stage(state, completed_node)
+        return handler(state)
+    
+    @staticmethod
+    def _base_response(current_stage: str, next_endpoint: Optional[str], needs_user_input: Optional[str],
+                       next_step_description: str, **fields: Any) -> Dict[str, Any]:
+        """Response shared by every stage; stage-specific fields (or overrides) come in as keywords"""
+        return {
+            "current_stage": current_stage,
+            "next_endpoint": next_endpoint,
+            "needs_user_input": needs_user_input,
+            "next_step_description": next_step_description,
+            **_RESPONSE_DEFAULTS,
+            **fields,
+        }
+    
+    def _handle_textual_analysis(self, state: AgentState) -> dict[str, Any]:
+        """STAGE 1: Textual Analysis Complete"""
+        get = state.get
+        state["current_workflow_stage"] = "textual_analysis_complete"
         
-        # STAGE 1: Textual Analysis Complete
-        if completed_node == "textual_analysis":
-            state["current_workflow_stage"] = "textual_analysis_complete"
-            
-            # Calculate confidence if not already done
-            if "average_confidence" not in state:
-                state["average_confidence"] = self.calculate_average_confidence(state)
-            
-            avg_confidence = state.get("average_confidence", 1.0)
+        # Calculate confidence if not already done
+        avg_confidence = get("average_confidence")
+        if avg_confidence is None:
+            avg_confidence = state["average_confidence"] = self.calculate_average_confidence(state)
+        
+        # INITIALIZE WORKFLOW PATH IF NOT SET
+        if "workflow_path" not in state:
+            state["workflow_path"] = [] 
+        ## Textual analysis -> skin cancer screening
+        if get("requires_skin_cancer_screening", False):
+            next_endpoint = "/patient/followup_questions"
+            needs_user_input = "followup_questions"
+            next_step_description = "Skin cancer screening questions needed"
             
-            # INITIALIZE WORKFLOW PATH IF NOT SET
-            if "workflow_path" not in state:
-                state["workflow_path"] = [] 
-            ## Textual analysis -> skin cancer screening
-            if state.get("requires_skin_cancer_screening", False):
-                next_endpoint = "/patient/followup_questions"
-                needs_user_input = "followup_questions"
-                next_step_description = "Skin cancer screening questions needed"
-                
-                state["workflow_path"] = ["textual_to_skin_screening"]
-            ## Textual analysis -> standard follow up 
-            elif avg_confidence < self.CONFIDENCE_THRESHOLD:
-                next_endpoint = "/patient/followup_questions"
-                needs_user_input = "followup_questions"
-                next_step_description = "Follow-up questions needed to improve accuracy"
-                
-                state["workflow_path"] = ["textual_to_followup", "followup_only"]
-            ## Textual analysis -> overall analysis 
-            else:
-                next_endpoint = "/patient/overall_analysis"
-                needs_user_input = None
-                next_step_description = "Ready for comprehensive analysis"
+            state["workflow_path"] = ["textual_to_skin_screening"]
+        ## Textual analysis -> standard follow up 
+        elif avg_confidence < self.CONFIDENCE_THRESHOLD:
+            next_endpoint = "/patient/followup_questions"
+            needs_user_input = "followup_questions"
+            next_step_description = "Follow-up questions needed to improve accuracy"
             
-            logger.info(f"✅ Textual analysis complete. Confidence: {avg_confidence:.2f}, Next: {next_step_description}")
-            logger.info(f"🔍 Workflow path set to: {state.get('workflow_path')}")
-
-            return {
-                "current_stage": "textual_analysis_complete",
-                "next_endpoint": next_endpoint,
-                "needs_user_input": needs_user_input,
-                "next_step_description": next_step_description,
-                "workflow_complete": False,
-                "show_next_button": True,
-                "confidence_score": avg_confidence,
-                "image_required": state.get("image_required", False)
-            }
-        
-        #STAGE 2: Follow-up Questions Complete
-        elif completed_node == "followup_interaction":
-            current_path = state.get("workflow_path", [])
-            followup_type = state.get("followup_type", "standard")
-                        
-            ## skin cancer screening -> standard follow-up
-            if state.get("requires_user_input", False) and followup_type == "standard" and "textual_to_skin_screening" in current_path:
-                # This happens when standard questions are ready for user input
-                next_endpoint = "/patient/followup_questions"
-                needs_user_input = "followup_questions"
-                next_step_description = "Standard follow-up questions for skin condition analysis"
-                
-                # Update workflow path to reflect the transition
-                state["workflow_path"] = ["textual_to_skin_screening", "skin_to_standard_followup"]
-                
-                logger.info(f"🔄 Standard follow-up questions ready for user input")
-                
-                return {
-                    "current_stage": "awaiting_followup_responses",
-                    "next_endpoint": next_endpoint,
-                    "needs_user_input": needs_user_input,
-                    "next_step_description": next_step_description,
-                    "workflow_complete": False,
-                    "show_next_button": True,
-                    "confidence_score": state.get("average_confidence", 0.5),
-                    "image_required": False,
-                }
-
-            ## skin cancer screening only
-            if state.get("image_required", False):
-                next_endpoint = "/patient/image_analysis"
-                needs_user_input = "image_upload"
-                next_step_description = "Medical image upload required for enhanced diagnosis"
-                
-                state["workflow_path"] = ["textual_to_skin_screening", "skin_to_image_analysis"]
-            else: 
-            ## standard follow-up only
-                logger.info("🔄 Standard follow-up analysis complete - no image required")
-                next_endpoint = "/patient/overall_analysis"
-                needs_user_input = None
-                next_step_description = "Ready for comprehensive analysis with follow-up data"
-                
-            return {
-                "current_stage": "followup_analysis_complete",
-                "next_endpoint": next_endpoint,
-                "needs_user_input": needs_user_input,
-                "next_step_description": next_step_description,
-                "workflow_complete": False,
-                "show_next_button": True,
-                "confidence_score": state.get("average_confidence", 0.5),
-                "image_required": state.get("image_required", False)
-            }
-        
-        #STAGE 3: Image Analysis Complete
-        elif completed_node == "image_analysis":
-            #After image analysis, always go to overall analysis
+            state["workflow_path"] = ["textual_to_followup", "followup_only"]
+        ## Textual analysis -> overall analysis 
+        else:
             next_endpoint = "/patient/overall_analysis"
             needs_user_input = None
-            next_step_description = "Ready for comprehensive analysis with image data"
-            
-            #Check if we have image analysis results
-            image_analysis = state.get("skin_lesion_analysis", {})
-            has_image_results = bool(image_analysis.get("image_diagnosis"))
-            
-            logger.info(f"✅ Image analysis complete. Has results: {has_image_results}, Next: {next_step_description}")
-            
-            return {
-                "current_stage": "image_analysis_complete",
-                "next_endpoint": next_endpoint,
-                "needs_user_input": needs_user_input,
-                "next_step_description": next_step_description,
-                "workflow_complete": False,
-                "show_next_button": True,
-                "confidence_score": state.get("average_confidence", 0.7),
-                "image_required": False,  # Image already processed
-                "image_results_available": has_image_results
-            }
+            next_step_description = "Ready for comprehensive analysis"
         
-        #STAGE 4: Overall Analysis Complete
-        elif completed_node == "overall_analysis":
-            #After overall analysis, go to healthcare recommendations
-            next_endpoint = "/patient/medical_report"
-            needs_user_input = None
-            next_step_description = "Generating comprehensive medical report"
-            
-            #Get final confidence from overall analysis
-            overall_analysis = state.get("overall_analysis", {})
-            final_confidence = overall_analysis.get("final_confidence", 0.0)
-            final_diagnosis = overall_analysis.get("final_diagnosis", "Analysis complete")
+        logger.info(f"✅ Textual analysis complete. Confidence: {avg_confidence:.2f}, Next: {next_step_description}")
+        logger.info(f"🔍 Workflow path set to: {get('workflow_path')}")
+
+        return self._base_response(
+            "textual_analysis_complete",
+            next_endpoint,
+            needs_user_input,
+            next_step_description,
+            confidence_score=avg_confidence,
+            image_required=get("image_required", False),
+        )
+    
+    def _handle_followup_interaction(self, state: AgentState) -> dict[str, Any]:
+        """STAGE 2: Follow-up Questions Complete"""
+        get = state.get
+        current_path = get("workflow_path", [])
+        followup_type = get("followup_type", "standard")
+        image_required = get("image_required", False)
+        avg_confidence = get("average_confidence", 0.5)
+                    
+        ## skin cancer screening -> standard follow-up
+        if get("requires_user_input", False) and followup_type == "standard" and "textual_to_skin_screening" in current_path:
+            # This happens when standard questions are ready for user input
+            next_endpoint = "/patient/followup_questions"
+            needs_user_input = "followup_questions"
+            next_step_description = "Standard follow-up questions for skin condition analysis"
             
-            logger.info(f"✅ Overall analysis complete. Final diagnosis: {final_diagnosis}, Confidence: {final_confidence:.2f}")
-            logger.info(f"🔄 Proceeding directly to medical report generation")
+            # Update workflow path to reflect the transition
+            state["workflow_path"] = ["textual_to_skin_screening", "skin_to_standard_followup"]
             
-            return {
-                "current_stage": "overall_analysis_complete",
-                "next_endpoint": next_endpoint,
-                "needs_user_input": needs_user_input,
-                "next_step_description": next_step_description,
-                "workflow_complete": False,
-                "show_next_button": True,
-                "confidence_score": final_confidence,
-                "final_diagnosis": final_diagnosis,
-                "analysis_complete": True
-            }
-        
-        #Medical Report Complete (Final Stage)
-        elif completed_node == "generate_report" or completed_node == "medical_report":
-            #Workflow is now complete
-            next_endpoint = None
-            needs_user_input = None
-            next_step_description = "Medical analysis workflow complete"
+            logger.info(f"🔄 Standard follow-up questions ready for user input")
             
-            #Check if report was generated
-            medical_report = state.get("medical_report", "")
-            has_report = bool(medical_report and len(medical_report.strip()) > 0)
+            return self._base_response(
+                "awaiting_followup_responses",
+                next_endpoint,
+                needs_user_input,
+                next_step_description,
+                confidence_score=avg_confidence,
+                image_required=False,
+            )
+
+        ## skin cancer screening only
+        if image_required:
+            next_endpoint = "/patient/image_analysis"
+            needs_user_input = "image_upload"
+            next_step_description = "Medical image upload required for enhanced diagnosis"
             
-            logger.info(f"✅ Medical report generation complete. Report available: {has_report}")
+            state["workflow_path"] = ["textual_to_skin_screening", "skin_to_image_analysis"]
+        else: 
+        ## standard follow-up only
+            logger.info("🔄 Standard follow-up analysis complete - no image required")
+            next_endpoint = "/patient/overall_analysis"
+            needs_user_input = None
+            next_step_description = "Ready for comprehensive analysis with follow-up data"
             
-            return {
-                "current_stage": "workflow_complete",
-                "next_endpoint": next_endpoint,
-                "needs_user_input": needs_user_input,
-                "next_step_description": next_step_description,
-                "workflow_complete": True,
-                "show_next_button": False,  # No more steps
-                "medical_report_available": has_report,
-                "workflow_summary": self._generate_workflow_summary(state)
-            }
+        return self._base_response(
+            "followup_analysis_complete",
+            next_endpoint,
+            needs_user_input,
+            next_step_description,
+            confidence_score=avg_confidence,
+            image_required=image_required,
+        )
+    
+    def _handle_image_analysis(self, state: AgentState) -> dict[str, Any]:
+        """STAGE 3: Image Analysis Complete"""
+        get = state.get
+        #After image analysis, always go to overall analysis
+        next_endpoint = "/patient/overall_analysis"
+        needs_user_input = None
+        next_step_description = "Ready for comprehensive analysis with image data"
         
-        #FALLBACK: Unknown completed node
-        else:
-            logger.warning(f"⚠️ Unknown completed node: {completed_node}")
-            return {
-                "current_stage": state.get("current_workflow_stage", "unknown"),
-                "next_endpoint": None,
-                "needs_user_input": None,
-                "next_step_description": f"Unknown stage: {completed_node}",
-                "workflow_complete": False,
-                "show_next_button": False,
-                "error": f"Unknown workflow stage: {completed_node}"
-            }
+        #Check if we have image analysis results
+        image_analysis = get("skin_lesion_analysis", {})
+        has_image_results = bool(image_analysis.get("image_diagnosis"))
+        
+        logger.info(f"✅ Image analysis complete. Has results: {has_image_results}, Next: {next_step_description}")
+        
+        return self._base_response(
+            "image_analysis_complete",
+            next_endpoint,
+            needs_user_input,
+            next_step_description,
+            confidence_score=get("average_confidence", 0.7),
+            image_required=False,  # Image already processed
+            image_results_available=has_image_results,
+        )
+    
+    def _handle_overall_analysis(self, state: AgentState) -> dict[str, Any]:
+        """STAGE 4: Overall Analysis Complete"""
+        #After overall analysis, go to healthcare recommendations
+        next_endpoint = "/patient/medical_report"
+        needs_user_input = None
+        next_step_description = "Generating comprehensive medical report"
+        
+        #Get final confidence from overall analysis
+        overall_analysis = state.get("overall_analysis", {})
+        final_confidence = overall_analysis.get("final_confidence", 0.0)
+        final_diagnosis = overall_analysis.get("final_diagnosis", "Analysis complete")
+        
+        logger.info(f"✅ Overall analysis complete. Final diagnosis: {final_diagnosis}, Confidence: {(final_confidence or 0.0):.2f}")
+        logger.info(f"🔄 Proceeding directly to medical report generation")
+        
+        return self._base_response(
+            "overall_analysis_complete",
+            next_endpoint,
+            needs_user_input,
+            next_step_description,
+            confidence_score=final_confidence,
+            final_diagnosis=final_diagnosis,
+            analysis_complete=True,
+        )
+    
+    def _handle_medical_report(self, state: AgentState) -> dict[str, Any]:
+        """Medical Report Complete (Final Stage)"""
+        #Workflow is now complete
+        next_endpoint = None
+        needs_user_input = None
+        next_step_description = "Medical analysis workflow complete"
+        
+        #Check if report was generated
+        medical_report = state.get("medical_report", "")
+        has_report = bool(medical_report and len(medical_report.strip()) > 0)
+        
+        logger.info(f"✅ Medical report generation complete. Report available: {has_report}")
+        
+        return self._base_response(
+            "workflow_complete",
+            next_endpoint,
+            needs_user_input,
+            next_step_description,
+            **_TERMINAL_RESPONSE,  # No more steps
+            medical_report_available=has_report,
+            workflow_summary=self._generate_workflow_summary(state),
+        )
+    
+    def _handle_unknown_stage(self, state: AgentState, completed_node: str) -> dict[str, Any]:
+        """FALLBACK: Unknown completed node"""
+        logger.warning(f"⚠️ Unknown completed node: {completed_node}")
+        return self._base_response(
+            state.get("current_workflow_stage", "unknown"),
+            None,
+            None,
+            f"Unknown stage: {completed_node}",
+            show_next_button=False,
+            error=f"Unknown workflow stage: {completed_node}",
+        )
     
     def _generate_workflow_summary(self, state: AgentState) -> Dict[str, Any]:
         """Generate a summary of the completed workflow"""
+        get = state.get  # bound once; looked up for every stage check below
+        
+        workflow_path = get("workflow_path", [])
         
-        workflow_path = state.get("workflow_path", [])
+        # Completed stages: one truthiness pass over the state, both lists are built from it
+        present = [check for check in self._STAGE_CHECKS if get(check[0])]
         
-        summary = {
+        return {
             "workflow_type": self._determine_workflow_type(workflow_path),
-            "stages_completed": [],
-            "total_stages": 0,
-            "data_sources_used": []
+            "stages_completed": [stage_name for _, stage_name, _ in present],
+            "total_stages": len(present),
+            "data_sources_used": [data_source for _, _, data_source in present if data_source]
         }
-        
-        # Track completed stages
-        if state.get("textual_analysis"):
-            summary["stages_completed"].append("textual_analysis")
-            summary["data_sources_used"].append("symptoms")
-            
-        if state.get("followup_diagnosis"):
-            summary["stages_completed"].append("followup_analysis")
-            summary["data_sources_used"].append("followup_questions")
-            
-        if state.get("skin_lesion_analysis"):
-            summary["stages_completed"].append("image_analysis")
-            summary["data_sources_used"].append("medical_image")
-            
-        if state.get("overall_analysis"):
-            summary["stages_completed"].append("overall_analysis")
-            
-        if state.get("healthcare_recommendation"):
-            summary["stages_completed"].append("healthcare_recommendations")
-            
-        if state.get("medical_report"):
-            summary["stages_completed"].append("medical_report")
-        
-        summary["total_stages"] = len(summary["stages_completed"])
-        
-        return summary
     
     def _determine_workflow_type(self, workflow_path: list) -> str:
         """Determine the type of workflow that was completed"""
+        return self._determine_workflow_type_cached(tuple(workflow_path or ()))
+    
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def _determine_workflow_type_cached(workflow_path: tuple) -> str:
+        """Workflow type for a path tuple (only a handful of path shapes occur, so results are cached)"""
         if not workflow_path:
             return "basic_analysis"
         
-        if workflow_path == ["textual_only"]:
+        if workflow_path == ("textual_only",):
             return "textual_analysis_only"
-        elif workflow_path == ["textual_to_image"]:
+        elif workflow_path == ("textual_to_image",):
             return "textual_and_image_analysis"
         elif "followup_only" in workflow_path:
             return "enhanced_textual_analysis"
@@ -1,60 +1,122 @@
-from ray import state
 from adapters.bedrock_model_adapter import BedrockModelAdapter
+from nodes.llm_diagnosis_node import parse_diagnosis_details
+from collections import OrderedDict
 from typing import Dict, Any, List
+import hashlib
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
+# Leading "1. " numbering and/or "- " / "• " bullet on a generated question line
+_LINE_PREFIX = re.compile(r'^(?:\d+\.\s*)?(?:[-•]\s*)?')
+
+# Question sets are fixed, so they are built once; the getters hand each state its own list copy
+_UNIVERSAL_QUESTIONS = (
+    "How long have you been experiencing these symptoms? (hours, days, weeks, months)",
+    "Have your symptoms gotten worse, better, or stayed the same since they started?",
+    "On a scale of 0–10, what is your current pain level? (0 = no pain, 10 = worst pain imaginable)",
+    "Do you have any other symptoms that you haven't mentioned yet?",
+    "Are you currently taking any medications, supplements, or have any known allergies?",
+)
+
+_SKIN_QUESTIONS = (
+    #ABCDE criteria questions
+    "Is the mole or lesion asymmetrical? (One half doesn't match the other)",
+    "Does the border of the mole or lesion appear irregular, ragged, or blurred?",
+    "Does it contain more than one color (e.g., black, brown, red)?",
+    "Is the diameter of the mole or lesion larger than 6mm (about the size of a pencil eraser)?",
+    "Has the mole or lesion changed in size, shape, or color over time?",
+    #Additional questions for skin cancer screening
+    "Does it bleed, itch, or cause pain?",
+    "Do you have a personal or family history of skin cancer or high sun exposure?",
+)
+
+# ABCDE + adjunct scoring per screening answer, by question index (must match _SKIN_QUESTIONS order):
+# 0 A, 1 B, 2 C, 3 D, 4 E, 5 Symptoms, 6 History -> (category, weight, is_adjunct)
+_SKIN_RISK_WEIGHTS = (
+    ("A", 2, False),
+    ("B", 2, False),
+    ("C", 2, False),
+    ("D", 1, False),
+    ("E", 2, False),
+    ("SYMPTOMS", 1, True),
+    ("HISTORY", 1, True),
+)
+_OTHER_RISK_WEIGHT = ("OTHER", 0, True)
+
+# Answer -> score value. The FollowUpForm radio values ("yes"/"neutral"/"no") and common capitalizations
+# resolve without normalizing; anything else is stripped/lowercased first (unknown scores 0.0)
+_RESPONSE_VALUES = {
+    "yes": 1.0, "Yes": 1.0, "YES": 1.0,
+    "neutral": 0.5, "Neutral": 0.5, "NEUTRAL": 0.5,
+    "no": 0.0, "No": 0.0, "NO": 0.0,
+}
+
+# Placeholder diagnosis recorded when screening sends the patient to image analysis (copied into each state)
+_SKIN_RISK_DIAGNOSIS = (
+    {"text_diagnosis": "Skin Cancer Risk Detected - Image Analysis Required", "diagnosis_confidence": None},
+)
+
+# Parsed follow-up diagnoses kept per node for identical resubmissions (same model + same combined Q&A text)
+DIAGNOSIS_CACHE_SIZE = 128
+
+# Fallback questions if generation fails
+_FALLBACK_QUESTIONS = (
+    "Can you describe your symptoms in more detail?",
+    "How long have you been experiencing these symptoms?",
+    "Have you noticed any triggers or patterns?",
+    "Do you have any relevant medical history?",
+    "Are you currently taking any medications?",
+)
+
 #followup_response contain both qna pairs, the parsing is used to combine initial user input and structured qna 
 #for context later (followup_qna_overall)
 
 class FollowUpInteractionNode:
     def __init__(self, adapter: BedrockModelAdapter):
         self.adapter = adapter
+        self._diagnosis_cache: OrderedDict[tuple, tuple[dict, ...]] = OrderedDict()
         
     async def __call__(self, state):
         return await self.handle_followup_interaction(state)
     
     async def handle_followup_interaction(self, state: dict[str, Any]) -> dict[str, Any]:
+        get = state.get
         # Check if already have followup_responses from user
-        followup_response = state.get("followup_response", {})
-        requires_user_input = state.get("requires_user_input", True)
-        followup_type = state.get("followup_type", "standard")
-        followup_questions = state.get("followup_questions", None)
-        current_stage = state.get("current_workflow_stage", "")
+        followup_response = get("followup_response", {})
+        requires_user_input = get("requires_user_input", True)
 
-        print(f"🔍 Follow-up interaction debug:")
-        print(f"   followup_response exists: {bool(followup_response)}")
-        print(f"   requires_user_input: {requires_user_input}")
-        print(f"   followup_type: {followup_type}")
-        print(f"   followup_response keys: {list(followup_response.keys()) if followup_response else 'None'}")
-        print(f"   followup_questions: {bool(followup_questions)}")
-        print(f"   current_stage: {current_stage}")
+        if logger.isEnabledFor(logging.DEBUG):
+            # Debug-only fields are read here so the normal path does two lookups, not five
+            logger.debug(
+                "🔍 Follow-up interaction debug: followup_response exists=%s, requires_user_input=%s, "
+                "followup_type=%s, followup_response keys=%s, followup_questions=%s, current_stage=%s",
+                bool(followup_response), requires_user_input, get("followup_type", "standard"),
+                followup_response.keys() if followup_response else None,  # view, only stringified if emitted
+                bool(get("followup_questions")), get("current_workflow_stage", ""),
+            )
         
         if not followup_response and requires_user_input:
             return await self._generate_questions_phase(state)
         elif followup_response and not requires_user_input:
-            result = await self._process_responses_phase(state, followup_response)
-            if result.get("image_required"): ## skin cancer screening -> image analysis
-                result["current_workflow_stage"] = "awaiting_image_upload"
-            elif result.get("requires_user_input"): ## skin cancer screening -> standard follow up
-                result["current_workflow_stage"] = "awaiting_followup_responses"
-            else: # standard follow-up -> overall analysis 
-                result["current_workflow_stage"] = "followup_analysis_complete"
-            return result
+            # Each branch of the responses phase sets the final current_workflow_stage itself
+            return await self._process_responses_phase(state, followup_response)
     
     async def _generate_questions_phase(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Generate appropriate questions based on skin cancer screening needs"""
         
         requires_screening = state.get("requires_skin_cancer_screening", False) 
         
-        print("Is requires_skin_cancer_screening set?", requires_screening)
+        logger.debug("Is requires_skin_cancer_screening set? %s", requires_screening)
         
         if requires_screening:
-            print("🔍 Generating skin cancer screening questions")
+            logger.debug("🔍 Generating skin cancer screening questions")
             questions_list = self._get_skin_cancer_screening_questions()
             state["followup_questions"] = questions_list
             state["followup_type"] = "skin_cancer_screening"
         else:
-            print("📝 Using standard follow-up questions")
+            logger.debug("📝 Using standard follow-up questions")
             questions_list = self._get_universal_medical_questions()
             state["followup_questions"] = questions_list
             state["followup_type"] = "standard"
@@ -64,13 +126,7 @@ class FollowUpInteractionNode:
 
     def _get_universal_medical_questions(self) -> list[str]:
         """Comprehensive medical questions that apply to all conditions"""
-        return [
-            "How long have you been experiencing these symptoms? (hours, days, weeks, months)",
-            "Have your symptoms gotten worse, better, or stayed the same since they started?",
-            "On a scale of 0–10, what is your current pain level? (0 = no pain, 10 = worst pain imaginable)",
-            "Do you have any other symptoms that you haven't mentioned yet?",
-            "Are you currently taking any medications, supplements, or have any known allergies?"
-        ]
+        return list(_UNIVERSAL_QUESTIONS)
         
     def _get_skin_cancer_screening_questions(self) -> list[str]:
         """Each questions follows the ABCDE criteria correspondingly which is widely used by clinicians and patients
@@ -82,17 +138,7 @@ class FollowUpInteractionNode:
     # "Does it contain multiple colors?",
     # "Is the size larger than 6mm (pencil eraser)?",
     # "Has the spot changed recently in any way?"
-        return [
-            #ABCDE criteria questions
-            "Is the mole or lesion asymmetrical? (One half doesn't match the other)",
-            "Does the border of the mole or lesion appear irregular, ragged, or blurred?",
-            "Does it contain more than one color (e.g., black, brown, red)?",
-            "Is the diameter of the mole or lesion larger than 6mm (about the size of a pencil eraser)?",
-            "Has the mole or lesion changed in size, shape, or color over time?",
-            #Additional questions for skin cancer screening
-            "Does it bleed, itch, or cause pain?",
-            "Do you have a personal or family history of skin cancer or high sun exposure?"
-        ]
+        return list(_SKIN_QUESTIONS)
         
     async def _process_responses_phase(self, state: dict[str, Any], responses: dict[str, str]) -> dict[str, Any]:
         """Process follow-up responses and re-analyze"""
@@ -112,36 +158,31 @@ class FollowUpInteractionNode:
             state["skin_cancer_risk_metrics"] = risk_metrics # store context information for overall analysis later 
             
             if needs_image_analysis: ## skin cancer screening only
-                print("🔍 SKIN CANCER RISK DETECTED - proceeding to image analysis")
+                logger.debug("🔍 SKIN CANCER RISK DETECTED - proceeding to image analysis")
                 state["image_required"] = True
                 state["skin_cancer_risk_detected"] = True
                 state["current_workflow_stage"] = "awaiting_image_upload"
-                
-                enhanced_diagnosis = [
-                    {"text_diagnosis": "Skin Cancer Risk Detected - Image Analysis Required", "diagnosis_confidence": None}
-                ]
-                state["followup_diagnosis"] = enhanced_diagnosis
+                state["followup_diagnosis"] = [dict(diagnosis) for diagnosis in _SKIN_RISK_DIAGNOSIS]  # fresh per session, state dicts get mutated
                 
                 return state
             else: ## skin cancer screening -> standard follow-up
-                print("✅ Low skin cancer risk - transitioning to standard follow-up")
+                logger.debug("✅ Low skin cancer risk - transitioning to standard follow-up")
 
                 # Transition to standard follow-up
                 state["followup_type"] = "standard"
                 state["requires_skin_cancer_screening"] = False
                 state["skin_cancer_risk_detected"] = False
                 state["image_required"] = False                
-                state["skin_cancer_screening_responses"] = state["followup_qna_overall"]
+                state["skin_cancer_screening_responses"] = enhanced_symptoms
                 state["requires_user_input"] = True
                 
-                #Clean up
-                state.pop("followup_questions", None)
-                questions_list = self._get_universal_medical_questions()
-                state["followup_questions"] = questions_list
+                #Clean up (followup_questions is overwritten in place, no pop needed)
+                state["followup_questions"] = self._get_universal_medical_questions()
                 
                 state.pop("followup_response", None)
                 state.pop("followup_diagnosis", None)
-                print("🔄 Transition complete - standard questions generated")
+                state["current_workflow_stage"] = "awaiting_followup_responses"
+                logger.debug("🔄 Transition complete - standard questions generated")
                 
                 return state
         else: ## standard follow-up only
@@ -149,29 +190,45 @@ class FollowUpInteractionNode:
             state["skin_cancer_risk_detected"] = False
             state["requires_user_input"] = False
                
-            # Get Q8 model for re-diagnosis
-            print(f"🔄 Generating standard follow-up diagnosis with enhanced symptoms...")
-            output = await self.adapter.generate_diagnosis(enhanced_symptoms)
-
-            # Parse results using the same parser as LLMDiagnosisNode
-            from nodes.llm_diagnosis_node import parse_diagnosis_details
-            diagnosis_results = parse_diagnosis_details(output)
+            diagnosis_results = await self._diagnose_followup(enhanced_symptoms)
             
             # Update state with improved analysis
-            state["followup_diagnosis"] = diagnosis_results if diagnosis_results else []
+            followup_diagnosis = state["followup_diagnosis"] = diagnosis_results or []
             
-            followup_diagnosis = state.get("followup_diagnosis", None)
-            if followup_diagnosis and isinstance(followup_diagnosis, list):
-                confidence_scores = [
-                    diagnosis.get("diagnosis_confidence", 0.0) 
-                    for diagnosis in followup_diagnosis
-                ]
-                
-            state["average_confidence"] = sum(confidence_scores) / len(confidence_scores)
+            # Unparseable output leaves no diagnoses; default to 0.0 instead of an unbound/zero-length average
+            confidence_scores = [diagnosis.get("diagnosis_confidence") or 0.0 for diagnosis in followup_diagnosis]
+            state["average_confidence"] = sum(confidence_scores) / len(confidence_scores) if confidence_scores else 0.0
+            state["current_workflow_stage"] = "followup_analysis_complete"
             
-            print(f"✅ Standard follow-up diagnosis complete - found {len(diagnosis_results)} diagnoses")
+            logger.debug("✅ Standard follow-up diagnosis complete - found %d diagnoses", len(diagnosis_results))
             return state
     
+    async def _diagnose_followup(self, enhanced_symptoms: str) -> list[dict]:
+        """Re-diagnose from the combined Q&A text, reusing the result of an identical earlier submission"""
+        cache_key = (
+            getattr(self.adapter, "model_id", None),  # a model swap never serves stale diagnoses
+            hashlib.blake2b(enhanced_symptoms.encode(), digest_size=16).digest(),
+        )
+        cached = self._diagnosis_cache.get(cache_key)
+        if cached is not None:
+            self._diagnosis_cache.move_to_end(cache_key)
+            logger.debug("♻️ Reusing cached follow-up diagnosis for identical responses")
+            return [dict(diagnosis) for diagnosis in cached]  # callers store and may mutate these
+        
+        # Get Q8 model for re-diagnosis
+        logger.debug("🔄 Generating standard follow-up diagnosis with enhanced symptoms...")
+        output = await self.adapter.generate_diagnosis(enhanced_symptoms)
+
+        # Parse results using the same parser as LLMDiagnosisNode
+        diagnosis_results = parse_diagnosis_details(output)
+        
+        # Only cache usable output so a failed/garbled generation is retried next time
+        if diagnosis_results:
+            self._diagnosis_cache[cache_key] = tuple(dict(diagnosis) for diagnosis in diagnosis_results)
+            if len(self._diagnosis_cache) > DIAGNOSIS_CACHE_SIZE:
+                self._diagnosis_cache.popitem(last=False)
+        return diagnosis_results
+    
         #     """Risk analysis based on weighted Yes/Neutral/No responses.
         # Returns True if risk_score >= threshold."""
         # weights = {
@@ -191,38 +248,25 @@ class FollowUpInteractionNode:
         Stores metrics in state externally if caller copies self.last_skin_risk.
         """
 
-        # Semantic mapping based on question order you already control
-        # (Still safer than hard weights dict with old threshold)
-        # Index meaning (must match _get_skin_cancer_screening_questions order):
-        # 0 A, 1 B, 2 C, 3 D, 4 E, 5 Symptoms, 6 History
-        weights = {
-            0: ("A", 2, False),
-            1: ("B", 2, False),
-            2: ("C", 2, False),
-            3: ("D", 1, False),
-            4: ("E", 2, False),
-            5: ("SYMPTOMS", 1, True),
-            6: ("HISTORY", 1, True),
-        }
-
-        def resp_value(r: str) -> float:
-            r = r.strip().lower()
-            if r == "yes":
-                return 1.0
-            if r == "neutral":
-                return 0.5
-            return 0.0  # no / unknown
+        # Semantic mapping based on question order you already control (see _SKIN_RISK_WEIGHTS)
+        weight_count = len(_SKIN_RISK_WEIGHTS)
+        response_value = _RESPONSE_VALUES.get
 
         core_score = 0.0
         adjunct_score = 0.0
+        any_adjunct_yes = False
         detail = []
 
         for idx, (question, answer) in enumerate(responses.items()):
-            label, w, is_adjunct = weights.get(idx, ("OTHER", 0, True))
-            val = resp_value(answer)
+            label, w, is_adjunct = _SKIN_RISK_WEIGHTS[idx] if idx < weight_count else _OTHER_RISK_WEIGHT
+            val = response_value(answer)
+            if val is None:
+                val = response_value(answer.strip().lower(), 0.0)
             contrib = w * val
             if is_adjunct:
                 adjunct_score += contrib
+                if val == 1.0 and w > 0:
+                    any_adjunct_yes = True
             else:
                 core_score += contrib
             detail.append({
@@ -236,8 +280,6 @@ class FollowUpInteractionNode:
                 "adjunct": is_adjunct
             })
 
-        any_adjunct_yes = any(d["adjunct"] and d["value"] == 1.0 and d["weight"] > 0 for d in detail)
-
         # Risk stratification
         # Core max = 2+2+2+1+2 = 9; adjunct max = 2 (symptoms + history)
         if core_score >= 6 or (core_score >= 5 and any_adjunct_yes):
@@ -252,13 +294,13 @@ class FollowUpInteractionNode:
             (risk_level == "moderate" and any_adjunct_yes)
         )
 
-        print("🔍 Skin cancer risk analysis (enhanced)")
-        print(f"   Core score: {core_score:.2f} / 9.00")
-        print(f"   Adjunct score: {adjunct_score:.2f} / 2.00")
-        print(f"   Risk level: {risk_level}")
-        print(f"   Any adjunct YES: {any_adjunct_yes}")
-        print(f"   Image recommended: {image_recommended}")
-        print(f"   Detail: {[ (d['category'], d['answer'], d['contribution']) for d in detail ]}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "🔍 Skin cancer risk analysis (enhanced): core score %.2f / 9.00, adjunct score %.2f / 2.00, "
+                "risk level %s, any adjunct YES %s, image recommended %s, detail %s",
+                core_score, adjunct_score, risk_level, any_adjunct_yes, image_recommended,
+                [(d["category"], d["answer"], d["contribution"]) for d in detail],
+            )
 
         risk_metrics = {
             "core_score": core_score,
@@ -276,15 +318,15 @@ class FollowUpInteractionNode:
         """Combine original symptoms with follow-up Q&A pairs"""
         
         # Start with original symptoms
-        combined = f"Initial user symptom input: {original_symptoms}\n\n"
-        combined += "Follow-up information:\n"
+        parts = [f"Initial user symptom input: {original_symptoms}", "", "Follow-up information:"]
         
         # Add each question-response pair
         for question, response in responses.items():
-            combined += f"Q: {question}\n"
-            combined += f"A: {response}\n\n"
+            parts.append(f"Q: {question}")
+            parts.append(f"A: {response}")
+            parts.append("")
         
-        return combined.strip()
+        return "\n".join(parts).strip()
     
     def _parse_questions(self, questions_text: str) -> List[str]:
         """Parse numbered questions from LLM response"""
@@ -293,22 +335,15 @@ class FollowUpInteractionNode:
         
         for line in lines:
             line = line.strip()
-            if line and (line[0].isdigit() or line.startswith('-') or line.startswith('•')):
+            if line and (line[0].isdigit() or line[0] in '-•'):
                 # Remove numbering and clean up
-                question = re.sub(r'^\d+\.\s*', '', line)  # Remove "1. "
-                question = re.sub(r'^[-•]\s*', '', question)  # Remove "- " or "• "
+                question = _LINE_PREFIX.sub('', line, count=1)  # Remove "1. " and/or "- " / "• "
                 if question: 
                     questions.append(question)
         
         # If no structured questions found, return the whole text as one question
         return questions if questions else [questions_text.strip()]
     
-    def _get_fallback_questions(self) -> List[str]:
+    def _get_fallback_questions(self) -> tuple[str, ...]:
         """Fallback questions if generation fails"""
-        return [
-            "Can you describe your symptoms in more detail?",
-            "How long have you been experiencing these symptoms?",
-            "Have you noticed any triggers or patterns?", 
-            "Do you have any relevant medical history?",
-            "Are you currently taking any medications?"
-        ]
\ No newline at end of file
+        return _FALLBACK_QUESTIONS
\ No newline at end of file
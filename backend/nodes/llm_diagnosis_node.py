@@ -1,8 +1,27 @@
 from typing import TypedDict, Tuple
+from operator import itemgetter
 import re
 from adapters.bedrock_model_adapter import BedrockModelAdapter  
 from schemas.medical_schemas import TextualSymptomAnalysisResult
 
+# Pre-filter for skin conditions
+SKIN_CANCER_KEYWORDS = frozenset({
+    'mole', 'lesion', 'growth', 'bump', 'spot', 'rash', 'patch', 'scab',
+    'discoloration', 'freckle', 'birthmark', 'wart', 'cyst', 'lump',
+    'melanoma', 'cancer', 'tumor', 'nevus', 'seborrheic', 'keratosis'
+})
+
+GENERAL_SKIN_KEYWORDS = frozenset({
+    'skin', 'dermatitis', 'eczema', 'psoriasis', 'acne', 'hives',
+    'rosacea', 'fungal', 'bacterial', 'viral', 'infection'
+})
+
+# One alternation over every keyword: a single scan of the message instead of one substring
+# search per keyword. Substring semantics are kept so plurals ("moles", "spots") still match.
+_SKIN_KEYWORD_PATTERN = re.compile(
+    "|".join(sorted(map(re.escape, SKIN_CANCER_KEYWORDS | GENERAL_SKIN_KEYWORDS), key=len, reverse=True))
+)
+
 def parse_diagnosis_details(raw_response: str) -> list[TextualSymptomAnalysisResult]:
     results: list[TextualSymptomAnalysisResult] = []
     
@@ -25,7 +44,7 @@ def parse_diagnosis_details(raw_response: str) -> list[TextualSymptomAnalysisRes
         }
         results.append(result)
         
-    results.sort(key=lambda x: x["diagnosis_confidence"], reverse=True)
+    results.sort(key=itemgetter("diagnosis_confidence"), reverse=True)
 
     return results
 
@@ -61,23 +80,10 @@ class LLMDiagnosisNode:
         # Directly use the text since validation was done upstream.'
         text = state.get("latest_user_message", "")
         
-        # Pre-filter for skin conditions
-        skin_cancer_keywords = [
-            'mole', 'lesion', 'growth', 'bump', 'spot', 'rash', 'patch', 'scab',
-            'discoloration', 'freckle', 'birthmark', 'wart', 'cyst', 'lump',
-            'melanoma', 'cancer', 'tumor', 'nevus', 'seborrheic', 'keratosis'
-        ]
-        
-        general_skin_keywords = [
-            'skin', 'dermatitis', 'eczema', 'psoriasis', 'acne', 'hives',
-            'rosacea', 'fungal', 'bacterial', 'viral', 'infection'
-        ]
-        
-        # Check for skin cancer specific symptoms
-        has_skin_cancer_indicators = any(keyword in text.lower() for keyword in skin_cancer_keywords)
-        has_general_skin_symptoms = any(keyword in text.lower() for keyword in general_skin_keywords)
+        # Check for skin cancer specific or general skin symptoms
+        has_skin_symptoms = _SKIN_KEYWORD_PATTERN.search(text.lower()) is not None
         
-        if has_skin_cancer_indicators or has_general_skin_symptoms:
+        if has_skin_symptoms:
             state["userInput_skin_symptoms"] = text
             state["requires_skin_cancer_screening"] = True
 
@@ -241,7 +241,7 @@ class MedicalReportNode:
         overall_analysis = state.get("overall_analysis", {})
         diagnosis = overall_analysis.get('final_diagnosis', 'Unknown')
         severity = overall_analysis.get('final_severity', 'moderate')
-        confidence = overall_analysis.get('final_confidence', 0.5)
+        confidence = overall_analysis.get('final_confidence') or 0.5
         specialist = overall_analysis.get('specialist_recommendation', 'general_practitioner')
         
         # Short, focused prompts for specific content
@@ -275,7 +275,7 @@ class MedicalReportNode:
         
         # Extract data for templates
         diagnosis = overall_analysis.get('final_diagnosis', 'Not determined')
-        confidence = overall_analysis.get('final_confidence', 0.0)
+        confidence = overall_analysis.get('final_confidence') or 0.0
         severity = overall_analysis.get('final_severity', 'moderate')
         specialist = overall_analysis.get('specialist_recommendation', 'general_practitioner')
         user_explanation = overall_analysis.get('user_explanation', 'Analysis completed')
@@ -419,7 +419,7 @@ Based on the comprehensive analysis of provided symptoms, our AI medical assista
 
 DIAGNOSTIC ASSESSMENT:
 • Primary Diagnosis: {overall_analysis.get('final_diagnosis', 'Not determined')}
-• Confidence Level: {(overall_analysis.get('final_confidence', 0) * 100):.1f}%
+• Confidence Level: {((overall_analysis.get('final_confidence') or 0) * 100):.1f}%
 • Severity Assessment: {overall_analysis.get('final_severity', 'unknown').title()}
 
 CLINICAL EXPLANATION:
@@ -480,7 +480,7 @@ Session: {session_id} | Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             for i, diag in enumerate(followup_diagnosis[1:], 1):
                 if i <= 3:  # Show top 3 alternatives
                     diagnosis_text = diag.get("text_diagnosis", "Unknown")
-                    confidence = diag.get("diagnosis_confidence", 0.0)
+                    confidence = diag.get("diagnosis_confidence") or 0.0
                     alternative_diagnoses.append(f"{i}. {diagnosis_text} ({confidence:.1%} confidence)")
         
         elif textual_analysis and len(textual_analysis) > 1:
@@ -489,7 +489,7 @@ Session: {session_id} | Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             for i, diag in enumerate(textual_analysis[1:], 1):
                 if i <= 3:  # Show top 3 alternatives
                     diagnosis_text = diag.get("text_diagnosis", "Unknown")
-                    confidence = diag.get("diagnosis_confidence", 0.0)
+                    confidence = diag.get("diagnosis_confidence") or 0.0
                     alternative_diagnoses.append(f"{i}. {diagnosis_text} ({confidence:.1%} confidence)")
         
         elif skin_lesion_analysis.get("confidence_score"):
@@ -650,7 +650,7 @@ Session: {session_id} | Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 # Summary version - extract key information
                 story.append(Paragraph("Executive Summary", styles['Heading2']))
                 story.append(Paragraph(f"Primary Diagnosis: {overall_analysis.get('final_diagnosis', 'N/A')}", styles['Normal']))
-                story.append(Paragraph(f"Confidence Level: {(overall_analysis.get('final_confidence', 0) * 100):.1f}%", styles['Normal']))
+                story.append(Paragraph(f"Confidence Level: {((overall_analysis.get('final_confidence') or 0) * 100):.1f}%", styles['Normal']))
                 story.append(Paragraph(f"Severity: {overall_analysis.get('final_severity', 'N/A').title()}", styles['Normal']))
                 story.append(Paragraph(f"Recommended Specialist: {overall_analysis.get('specialist_recommendation', 'General Practitioner').replace('_', ' ').title()}", styles['Normal']))
                 story.append(Spacer(1, 12))
@@ -755,7 +755,7 @@ Session: {session_id} | Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 
                 cells = table.rows[1].cells
                 cells[0].text = 'Confidence Level'
-                cells[1].text = f"{(overall_analysis.get('final_confidence', 0) * 100):.1f}%"
+                cells[1].text = f"{((overall_analysis.get('final_confidence') or 0) * 100):.1f}%"
                 
                 cells = table.rows[2].cells
                 cells[0].text = 'Severity'
@@ -805,7 +805,7 @@ Session: {session_id} | Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     Session ID: {state.get('session_id', 'Unknown')}
 
     PRIMARY DIAGNOSIS: {overall_analysis.get('final_diagnosis', 'N/A')}
-    CONFIDENCE: {(overall_analysis.get('final_confidence', 0) * 100):.1f}%
+    CONFIDENCE: {((overall_analysis.get('final_confidence') or 0) * 100):.1f}%
     SEVERITY: {overall_analysis.get('final_severity', 'N/A').title()}
     SPECIALIST: {overall_analysis.get('specialist_recommendation', 'General Practitioner').replace('_', ' ').title()}
 
@@ -822,7 +822,7 @@ Session: {session_id} | Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}
 
     PRIMARY DIAGNOSIS: {overall_analysis.get('final_diagnosis', 'N/A')}
-    CONFIDENCE: {(overall_analysis.get('final_confidence', 0) * 100):.1f}%
+    CONFIDENCE: {((overall_analysis.get('final_confidence') or 0) * 100):.1f}%
     SEVERITY: {overall_analysis.get('final_severity', 'N/A').title()}
     SPECIALIST: {overall_analysis.get('specialist_recommendation', 'General Practitioner').replace('_', ' ').title()}
 
@@ -844,7 +844,7 @@ Session: {session_id} | Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     Generated on {datetime.now().strftime('%B %d, %Y at %I:%M %p')}
 
     PRIMARY DIAGNOSIS: {overall_analysis.get('final_diagnosis', 'N/A')}
-    CONFIDENCE: {(overall_analysis.get('final_confidence', 0) * 100):.1f}%
+    CONFIDENCE: {((overall_analysis.get('final_confidence') or 0) * 100):.1f}%
     SEVERITY: {overall_analysis.get('final_severity', 'N/A').title()}
     SPECIALIST: {overall_analysis.get('specialist_recommendation', 'General Practitioner').replace('_', ' ').title()}
 
@@ -3,8 +3,68 @@ from typing import Dict, Any, List, Optional
 import googlemaps
 import os
 import asyncio
-from functools import lru_cache
-import hashlib
+from collections import OrderedDict
+from math import radians, cos, sin, asin, sqrt
+import re
+
+# Bounded LRU sizes for the per-node result caches (the old dicts grew for the life of the process)
+FACILITY_CACHE_SIZE = 512
+ADVICE_CACHE_SIZE = 512
+
+# Facility lookups are cached per ~110m cell (3 decimal places of lat/lng) so nearby users share results
+COORDINATE_CACHE_DECIMALS = 3
+
+# Map specialist types to Places search queries
+SPECIALIST_SEARCH_QUERIES = {
+    "dermatologist": "dermatologist near me",
+    "cardiologist": "cardiologist near me",
+    "neurologist": "neurologist near me",
+    "general_practitioner": "family doctor near me",
+}
+
+# Overall-analysis guidance -> recommendation type (takes priority over keyword/severity rules)
+GUIDANCE_RECOMMENDATION = {
+    "urgent_care_recommended": "emergency_care",
+    "specialist_consultation_recommended": "see_specialist",
+    "self_care_appropriate": "self_care",
+    "monitoring_recommended": "see_specialist",  # Better safe than sorry
+}
+
+# Diagnoses that always route to emergency care (one precompiled scan instead of a substring loop)
+_EMERGENCY_DIAGNOSIS_RE = re.compile("heart attack|stroke|severe bleeding|difficulty breathing|chest pain")
+
+# Static payloads for the error/fallback paths, built once instead of per call
+FALLBACK_SELF_CARE_ADVICE = (
+    "Rest and avoid strenuous activities",
+    "Stay hydrated by drinking plenty of water",
+    "Monitor your symptoms closely",
+    "Seek medical attention if symptoms worsen",
+    "Follow up with your healthcare provider",
+)
+
+DEFAULT_RECOMMENDATION = {
+    "recommendation_type": "see_specialist",
+    "self_care_advice": ("Consult with a healthcare professional for proper diagnosis",),
+    "specialist_type": "general_practitioner",
+    "nearby_facilities": (),
+    "rag_evidence": (),
+}
+
+def _compile_keyword_pattern(keywords) -> re.Pattern:
+    """One pattern over all keywords; the lookahead reports every (overlapping) occurrence in a single scan"""
+    return re.compile("(?=(" + "|".join(map(re.escape, keywords)) + "))")
+
+def _first_listed_match(pattern: re.Pattern, priority: Dict[str, int], text: str) -> Optional[str]:
+    """Keyword found in text that comes first in listing order (same result as scanning the keywords in order)"""
+    found = {match.group(1) for match in pattern.finditer(text)}
+    return min(found, key=priority.__getitem__) if found else None
+
+def _cache_store(cache: OrderedDict, key, value, max_size: int) -> None:
+    """Insert into an LRU-ordered cache, evicting the least recently used entry past max_size"""
+    cache[key] = value
+    cache.move_to_end(key)
+    if len(cache) > max_size:
+        cache.popitem(last=False)
 
 class HealthcareRecommendationNode:
     def __init__(self, adapter: LocalModelAdapter, google_maps_api_key: Optional[str] = None):
@@ -12,8 +72,8 @@ class HealthcareRecommendationNode:
         self.gmaps_client = googlemaps.Client(key=google_maps_api_key) if google_maps_api_key else None
         
         # Add caches for performance optimization
-        self._facility_cache = {}  # Cache Google Maps results
-        self._advice_cache = {}    # Cache LLM-generated advice
+        self._facility_cache: OrderedDict = OrderedDict()  # Cache Google Maps results
+        self._advice_cache: OrderedDict = OrderedDict()    # Cache LLM-generated advice
         
         # Define severity thresholds and specialist mappings
         self.severity_mapping = {
@@ -52,6 +112,8 @@ class HealthcareRecommendationNode:
             "cold": "general_practitioner",
             "flu": "general_practitioner",
         }
+        self._specialist_pattern = _compile_keyword_pattern(self.specialist_mapping)
+        self._specialist_priority = {condition: i for i, condition in enumerate(self.specialist_mapping)}
 
         # Pre-computed self-care advice templates for performance
         self.self_care_templates = {
@@ -91,6 +153,8 @@ class HealthcareRecommendationNode:
                 "Schedule dermatologist appointment for evaluation"
             ]
         }
+        self._self_care_pattern = _compile_keyword_pattern(self.self_care_templates)
+        self._self_care_priority = {condition: i for i, condition in enumerate(self.self_care_templates)}
     
     async def __call__(self, state):
         return await self.generate_healthcare_recommendation(state)
@@ -196,35 +260,30 @@ class HealthcareRecommendationNode:
     
     def _get_default_recommendation(self):
         """Default recommendation for error cases"""
+        # Fresh lists each call: callers store the recommendation in state and may extend it
         return {
-            "recommendation_type": "see_specialist",
-            "self_care_advice": ["Consult with a healthcare professional for proper diagnosis"],
-            "specialist_type": "general_practitioner",
+            **DEFAULT_RECOMMENDATION,
+            "self_care_advice": list(DEFAULT_RECOMMENDATION["self_care_advice"]),
             "nearby_facilities": [],
-            "rag_evidence": []
+            "rag_evidence": [],
         }
 
     def _determine_recommendation_type(self, diagnosis: str, severity: str, confidence: float, guidance: str = "") -> str:
         """Enhanced recommendation logic using overall analysis guidance"""
         
         # Use overall analysis guidance first (highest priority)
-        if guidance == "urgent_care_recommended":
-            return "emergency_care"
-        elif guidance == "specialist_consultation_recommended":
-            return "see_specialist"
-        elif guidance == "self_care_appropriate":
-            return "self_care"
-        elif guidance == "monitoring_recommended":
-            return "see_specialist"  # Better safe than sorry
+        recommendation_type = GUIDANCE_RECOMMENDATION.get(guidance)
+        if recommendation_type is not None:
+            return recommendation_type
         
         # Check for emergency keywords in diagnosis
-        emergency_keywords = ["heart attack", "stroke", "severe bleeding", "difficulty breathing", "chest pain"]
-        if any(keyword in diagnosis.lower() for keyword in emergency_keywords):
+        if _EMERGENCY_DIAGNOSIS_RE.search(diagnosis.lower()):
             return "emergency_care"
         
         # Fall back to severity-based logic
-        if severity in self.severity_mapping:
-            return self.severity_mapping[severity]
+        recommendation_type = self.severity_mapping.get(severity)
+        if recommendation_type is not None:
+            return recommendation_type
         
         # Low confidence cases should see a specialist for safety
         if confidence < 0.4:
@@ -235,32 +294,25 @@ class HealthcareRecommendationNode:
     
     def _determine_specialist_type(self, diagnosis: str) -> str:
         """Determine appropriate specialist based on diagnosis"""
-        diagnosis_lower = diagnosis.lower()
-        
-        for condition, specialist in self.specialist_mapping.items():
-            if condition in diagnosis_lower:
-                return specialist
+        condition = _first_listed_match(self._specialist_pattern, self._specialist_priority, diagnosis.lower())
+        if condition is not None:
+            return self.specialist_mapping[condition]
         
         return "general_practitioner"  # Default
     
-    @lru_cache(maxsize=100)
-    def _cache_key(self, *args) -> str:
-        """Generate cache key from arguments"""
-        return hashlib.md5(str(args).encode()).hexdigest()
-    
     async def _generate_self_care_advice(self, diagnosis: str, severity: str) -> List[str]:
         """Generate self-care advice with template fallback for performance"""
-        diagnosis_lower = diagnosis.lower()
-        
         # Check for template match first (fastest)
-        for condition, advice in self.self_care_templates.items():
-            if condition in diagnosis_lower:
-                return advice
+        condition = _first_listed_match(self._self_care_pattern, self._self_care_priority, diagnosis.lower())
+        if condition is not None:
+            return self.self_care_templates[condition]
         
         # Check cache for previously generated advice
-        cache_key = self._cache_key(diagnosis, severity)
-        if cache_key in self._advice_cache:
-            return self._advice_cache[cache_key]
+        cache_key = (diagnosis, severity)
+        cached = self._advice_cache.get(cache_key)
+        if cached is not None:
+            self._advice_cache.move_to_end(cache_key)
+            return cached
         
         # Fall back to LLM generation for unknown conditions
         try:
@@ -282,68 +334,61 @@ class HealthcareRecommendationNode:
             advice_list = self._parse_advice_list(advice_text)
             
             # Cache the result
-            self._advice_cache[cache_key] = advice_list
+            _cache_store(self._advice_cache, cache_key, advice_list, ADVICE_CACHE_SIZE)
             return advice_list
             
         except Exception:
             # Fallback advice
-            fallback_advice = [
-                "Rest and avoid strenuous activities",
-                "Stay hydrated by drinking plenty of water",
-                "Monitor your symptoms closely",
-                "Seek medical attention if symptoms worsen",
-                "Follow up with your healthcare provider"
-            ]
-            self._advice_cache[cache_key] = fallback_advice
-            return fallback_advice
+            advice_list = list(FALLBACK_SELF_CARE_ADVICE)
+            _cache_store(self._advice_cache, cache_key, advice_list, ADVICE_CACHE_SIZE)
+            return advice_list
     
     async def _find_nearby_facilities(self, location: Dict[str, float], specialist_type: str) -> List[Dict[str, str]]:
         """Find nearby healthcare facilities with caching"""
-        cache_key = self._cache_key(location["lat"], location["lng"], specialist_type)
-        
-        # Check cache first
-        if cache_key in self._facility_cache:
-            return self._facility_cache[cache_key]
+        cache_key = (
+            round(location["lat"], COORDINATE_CACHE_DECIMALS),
+            round(location["lng"], COORDINATE_CACHE_DECIMALS),
+            specialist_type,
+        )
         
-        if not self.gmaps_client:
-            return []
-        
-        try:
-            # Map specialist types to search queries
-            search_queries = {
-                "dermatologist": "dermatologist near me",
-                "cardiologist": "cardiologist near me", 
-                "neurologist": "neurologist near me",
-                "general_practitioner": "family doctor near me"
-            }
+        # Check cache first (raw Places results; distances depend on the exact location and are computed per call)
+        places = self._facility_cache.get(cache_key)
+        if places is not None:
+            self._facility_cache.move_to_end(cache_key)
+        else:
+            if not self.gmaps_client:
+                return []
             
-            query = search_queries.get(specialist_type, "clinic near me")
-            
-            # Search for places
-            places_result = self.gmaps_client.places_nearby(
-                location=(location["lat"], location["lng"]),
-                radius=10000,  # 10km radius
-                type="hospital",
-                keyword=query
-            )
-            
-            facilities = []
-            for place in places_result.get("results", [])[:5]:  # Limit to 5 results
-                facility = {
-                    "name": place.get("name", "Unknown"),
-                    "address": place.get("vicinity", "Address not available"),
-                    "rating": str(place.get("rating", "No rating")),
-                    "phone": place.get("formatted_phone_number", ""),
-                    "distance": self._calculate_distance(location, place.get("geometry", {}).get("location", {}))
-                }
-                facilities.append(facility)
+            try:
+                query = SPECIALIST_SEARCH_QUERIES.get(specialist_type, "clinic near me")
+                
+                # Search for places (googlemaps is a blocking HTTP client, so keep it off the event loop)
+                places_result = await asyncio.to_thread(
+                    self.gmaps_client.places_nearby,
+                    location=(location["lat"], location["lng"]),
+                    radius=10000,  # 10km radius
+                    type="hospital",
+                    keyword=query
+                )
+            except Exception as e:
+                return []
             
+            places = places_result.get("results", [])[:5]  # Limit to 5 results
             # Cache the result
-            self._facility_cache[cache_key] = facilities
-            return facilities
-            
-        except Exception as e:
-            return []
+            _cache_store(self._facility_cache, cache_key, places, FACILITY_CACHE_SIZE)
+        
+        facilities = []
+        for place in places:
+            facility = {
+                "name": place.get("name", "Unknown"),
+                "address": place.get("vicinity", "Address not available"),
+                "rating": str(place.get("rating", "No rating")),
+                "phone": place.get("formatted_phone_number", ""),
+                "distance": self._calculate_distance(location, place.get("geometry", {}).get("location", {}))
+            }
+            facilities.append(facility)
+        
+        return facilities
         
     async def _get_rag_evidence(self, diagnosis: str) -> List[str]:
         """Get supporting evidence from RAG system"""
@@ -371,7 +416,8 @@ class HealthcareRecommendationNode:
             return []
         
         try:
-            places_result = self.gmaps_client.places_nearby(
+            places_result = await asyncio.to_thread(
+                self.gmaps_client.places_nearby,
                 location=(location["lat"], location["lng"]),
                 radius=15000,  # 15km radius for emergency
                 type="hospital",
@@ -400,8 +446,7 @@ class HealthcareRecommendationNode:
         
         for line in lines:
             line = line.strip()
-            if line and (line.startswith('-') or line.startswith('•') or 
-                        (len(line) > 0 and line[0].isdigit())):
+            if line and (line[0] in '-•' or line[0].isdigit()):
                 # Remove bullets and numbering
                 clean_line = line.lstrip('-•0123456789. ').strip()
                 if clean_line:
@@ -416,8 +461,6 @@ class HealthcareRecommendationNode:
     def _calculate_distance(self, loc1: Dict[str, float], loc2: Dict[str, float]) -> str:
         """Calculate approximate distance between two coordinates"""
         try:
-            from math import radians, cos, sin, asin, sqrt
-            
             lat1, lon1 = radians(loc1["lat"]), radians(loc1["lng"])
             lat2, lon2 = radians(loc2["lat"]), radians(loc2["lng"])
             
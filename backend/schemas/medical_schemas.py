@@ -1,5 +1,6 @@
 from typing_extensions import TypedDict, Literal
 from typing import Optional, List, Dict, Union, Any
+from pydantic import ConfigDict
 
 # Workflow stage enum for type safety
 WorkflowStage = Literal[
@@ -45,11 +46,14 @@ WorkflowPathType = Literal[
     "skin_to_image_analysis",  # Instance 2: Skin screening -> Image analysis
     "textual_to_followup",    # Instance 3 & 4: Textual -> Follow-up (start)
     "followup_only",          # Instance 3: Follow-up -> Overall analysis
+    "followup_to_image",      # Instance 4: Follow-up -> Image analysis
     "skin_to_standard_followup" # Instance 3: Skin screening -> Standard follow-up (negative assessment on skin cancer)
 ]
 
 class WorkflowInfo(TypedDict, total=False):
-    current_stage: WorkflowStage
+    __pydantic_config__ = ConfigDict(extra="allow")
+
+    current_stage: str  # usually a WorkflowStage, but the session tracker also reports e.g. "initializing"
     ui_component: str  # Backend tells frontend which component to render
     next_endpoint: str | None
     needs_user_input: Literal["followup_questions", "image_upload"] | None
@@ -61,16 +65,22 @@ class WorkflowInfo(TypedDict, total=False):
 
 #Minimal schema on purpose during early stages to enable lazy loading for performance(without reasoning/severity)
 class TextualSymptomAnalysisResult(TypedDict):
+    __pydantic_config__ = ConfigDict(extra="allow")
+
     text_diagnosis: str | None
     diagnosis_confidence: float | None  # Confidence score between 0 and 1
     
 class SkinLesionImageAnalysisResult(TypedDict):
+    __pydantic_config__ = ConfigDict(extra="allow")
+
     image_diagnosis: str | None
     confidence_score: Union[dict[str, float]] | None
     
-class OverallAnalysisResult(TypedDict):
+class OverallAnalysisResult(TypedDict, total=False):  # fallback paths may write only some keys
+    __pydantic_config__ = ConfigDict(extra="allow")
+
     final_diagnosis: str
-    final_confidence: float
+    final_confidence: float | None          # None when the primary diagnosis carried no confidence
     final_severity: str                     # mild/moderate/severe/critical/emergency
 
     user_explanation: str           # Simple explanation for patients (low health literacy)
@@ -92,12 +102,15 @@ class OverallAnalysisResult(TypedDict):
 #     cost_estimates: Optional[Dict[str, str]]
 
 class AgentState(TypedDict, total=False):
+    # Keep keys that are not declared below (e.g. latest_user_message) when validating previous_state
+    __pydantic_config__ = ConfigDict(extra="allow")
+
     session_id: str #Unique ID for session
     workflow: WorkflowInfo #Unified worfklow info- single source of truth
     current_workflow_stage: str | None
     
     #Data tracking
-    image_required: bool
+    image_required: bool | None
     requires_skin_cancer_screening: bool | None  # Flag for skin cancer screening
     workflow_path: list[WorkflowPathType] | None
     average_confidence: float | None # Average confidence score across all diagnoses for textual analysis and follow-up diagnosis
@@ -113,7 +126,7 @@ class AgentState(TypedDict, total=False):
     followup_questions: list[str] | None
     followup_response: dict[str, str] | None # Follow-up responses from user
     followup_qna_overall: str | None # Combined Q&A pairs from follow-up interaction
-    followup_diagnosis: list[TextualSymptomAnalysisResult] |  None
+    followup_diagnosis: list[TextualSymptomAnalysisResult] | None
     skin_cancer_risk_detected: bool | None # Result of skin cancer risk analysis
     
     skin_cancer_risk_metrics: dict[str, Any] | None  # Detailed ABCDE scoring and risk analysis
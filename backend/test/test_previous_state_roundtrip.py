@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Round-trip test for previous_state
+Sends workflow states produced by the backend itself back through every endpoint that accepts previous_state.
+Requires the API running on localhost:8000.
+"""
+import json
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+# Every endpoint taking previous_state, in the order the frontend calls them
+PREVIOUS_STATE_ENDPOINTS = [
+    "/patient/followup_questions",
+    "/patient/image_analysis",
+    "/patient/overall_analysis",
+    "/patient/medical_report",
+]
+
+def post_previous_state(endpoint: str, session_id: str, state: dict) -> requests.Response:
+    """Post a state to an endpoint exactly like the frontend does (JSON in a form field)"""
+    form_data = {
+        'session_id': session_id,
+        'previous_state': json.dumps(state),
+    }
+    return requests.post(f"{BASE_URL}{endpoint}", data=form_data)
+
+def test_roundtrip_from_textual_analysis():
+    """Feed each endpoint's result into the next one, starting from a real textual analysis"""
+    session_id = "session_roundtrip_123"
+    response = requests.post(f"{BASE_URL}/patient/textual_analysis", data={
+        'user_symptoms': 'A mole on my arm has grown and changed colour over the last month',
+        'session_id': session_id,
+    })
+    print(f"🔍 /patient/textual_analysis -> {response.status_code}")
+    if response.status_code != 200:
+        print(f"❌ FAILED: {response.text}")
+        return False
+
+    state = response.json()["result"]
+    for endpoint in PREVIOUS_STATE_ENDPOINTS:
+        response = post_previous_state(endpoint, session_id, state)
+        print(f"🔍 {endpoint} -> {response.status_code}")
+        if response.status_code != 200:
+            print(f"❌ FAILED: {response.text}")
+            return False
+        state = response.json()["result"]
+
+    print("✅ Real workflow state accepted by every endpoint")
+    return True
+
+def test_fallback_state_is_accepted():
+    """State shapes the backend writes on its fallback paths must not be rejected as invalid (422)"""
+    session_id = "session_roundtrip_fallback_123"
+    state = {
+        "session_id": session_id,
+        "current_workflow_stage": "followup_analysis_complete",
+        "workflow": {"current_stage": "initializing", "progress_percentage": 0},
+        "image_required": None,
+        "userInput_symptoms": "A mole on my arm has grown and changed colour",
+        "workflow_path": ["textual_to_skin_screening", "skin_to_image_analysis"],
+        # Extra keys inside nested results are kept
+        "textual_analysis": [{"text_diagnosis": "Melanoma", "diagnosis_confidence": 0.41, "severity": "moderate"}],
+        # Skin-risk placeholder diagnosis carries no confidence...
+        "followup_diagnosis": [
+            {"text_diagnosis": "Skin Cancer Risk Detected - Image Analysis Required", "diagnosis_confidence": None}
+        ],
+        # ...so the fallback overall analysis built from it has final_confidence None
+        "overall_analysis": {
+            "final_diagnosis": "Skin Cancer Risk Detected - Image Analysis Required",
+            "final_confidence": None,
+            "final_severity": "unknown",
+        },
+        "latest_user_message": "uploaded photo",
+    }
+
+    ok = True
+    for endpoint in ("/patient/overall_analysis", "/patient/medical_report"):
+        response = post_previous_state(endpoint, session_id, state)
+        print(f"🔍 {endpoint} -> {response.status_code}")
+        if response.status_code == 422:
+            print(f"❌ State rejected: {response.text}")
+            ok = False
+
+    if ok:
+        print("✅ Fallback state accepted")
+    return ok
+
+def test_malformed_state_is_client_error():
+    """Malformed previous_state should be a 422, not a 500"""
+    ok = True
+    for endpoint in PREVIOUS_STATE_ENDPOINTS:
+        response = post_previous_state(endpoint, "session_malformed_123", {"workflow_path": "not-a-list"})
+        print(f"🔍 {endpoint} -> {response.status_code}")
+        if response.status_code != 422:
+            print(f"❌ Expected 422, got {response.status_code}: {response.text}")
+            ok = False
+
+    if ok:
+        print("✅ Malformed state reported as 422 everywhere")
+    return ok
+
+if __name__ == "__main__":
+    results = [
+        test_roundtrip_from_textual_analysis(),
+        test_fallback_state_is_accepted(),
+        test_malformed_state_is_client_error(),
+    ]
+    print(f"\n📊 {sum(results)}/{len(results)} round-trip checks passed")